@@ -1,18 +1,7 @@
 import streamlit as st
-import preprocessor, helper
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
-import networkx as nx
-import io
-import os
-
-# ReportLab Imports for PDF report generation
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.lib.utils import ImageReader
-from datetime import datetime
+import helper, chat_cache, result_cache, report, profiler
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # ---------------------------
 # STREAMLIT PAGE CONFIGURATION
@@ -59,7 +48,7 @@ with st.expander("Important: Security & Usage Instructions"):
 We do not store or upload your chat data to any external server. All analysis is performed locally within this application session.
 
 **2. Supported File Format**  
-Please upload your WhatsApp chat export as a .txt file.  
+Please upload your WhatsApp chat export as a .txt file, or the .zip file created by WhatsApp as is.  
 *(Tip: In WhatsApp, use "Export Chat" > "Without Media".)*
 
 **3. Confidentiality**  
@@ -75,115 +64,398 @@ By using this tool, you agree that the analysis is provided for informational pu
 # ---------------------------
 # FILE UPLOADER SECTION
 # ---------------------------
-uploaded_file = st.file_uploader("Upload your exported WhatsApp chat (.txt)", type=["txt"])
+uploaded_file = st.file_uploader("Upload your exported WhatsApp chat (.txt or .zip)", type=["txt", "zip"])
 if uploaded_file is not None:
     st.success(
         "File uploaded successfully! \n"
         "Now select a user (or Overall) in the left sidebar and click **Show Analysis**."
     )
 else:
-    st.info("Please upload a .txt file to begin analysis.")
+    st.info("Please upload a .txt or .zip file to begin analysis.")
 
 st.markdown("---")
 st.write("Made with Streamlit. © 2025 | [Privacy Policy](#) | [Terms of Service](#)")
 
 # ---------------------------
-# HELPER FUNCTION: Wrap text for PDF chart titles
+# BACKGROUND COMPUTATION
 # ---------------------------
-def wrap_text(text, max_chars=30):
-    words = text.split()
-    lines = []
-    current_line = ""
-    for word in words:
-        if len(current_line + word) <= max_chars:
-            current_line += word + " "
+@st.cache_resource
+def background_jobs():
+    """
+    Thread pool for the slow analyses (topics, sentiment, link extraction) and the futures of the jobs
+    it is running, shared by every session so the same analysis is never started twice.
+    """
+    return ThreadPoolExecutor(max_workers=2), {}, threading.Lock()
+
+def start_in_background(func, *args, **kwargs):
+    """
+    Starts a memoized helper call in the background unless its result is cached or it is already
+    running, and returns its future (None if the result is cached).
+    """
+    if func.is_cached(*args, **kwargs):
+        return None
+    executor, jobs, lock = background_jobs()
+    key = result_cache.call_key(func, args, kwargs)
+    with lock:
+        if key not in jobs:
+            jobs[key] = executor.submit(func, *args, **kwargs)
+        return jobs[key]
+
+def show_when_ready(label, render, func, *args, **kwargs):
+    """
+    Renders `render(result)` for a slow helper call. If the result is not cached yet, the call runs in
+    the background and a placeholder polls it, rerunning the page once the result is in the cache;
+    meanwhile the rest of the page stays usable.
+    """
+    future = start_in_background(func, *args, **kwargs)
+    if future is None:
+        render(func(*args, **kwargs))
+        return
+
+    @st.fragment(run_every=1)
+    def wait_for_result():
+        if not future.done():
+            st.info(f"Computing {label} in the background...")
+            return
+        # A finished job is forgotten either way, so a failed one is retried on the next rerun
+        executor, jobs, lock = background_jobs()
+        key = result_cache.call_key(func, args, kwargs)
+        with lock:
+            if jobs.get(key) is future:
+                del jobs[key]
+        if future.exception() is not None:
+            st.error(f"Error while computing {label}: {future.exception()}")
         else:
-            lines.append(current_line.strip())
-            current_line = word + " "
-    if current_line:
-        lines.append(current_line.strip())
-    return lines
+            st.rerun()
+    wait_for_result()
 
 # ---------------------------
-# FUNCTION: PDF Report Generation
+# ANALYSIS SECTIONS (each tab renders only when it is open)
 # ---------------------------
-def generate_pdf_charts_report(charts, summary_text=""):
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    page_width, page_height = letter
-    margin = 0.5 * inch
-
-    # --- COVER PAGE ---
-    c.setFillColorRGB(0.95, 0.95, 0.95)
-    c.rect(0, 0, page_width, page_height, fill=1)
-    c.setLineWidth(2)
-    c.setStrokeColorRGB(0, 0, 0)
-    c.rect(margin, margin, page_width - 2*margin, page_height - 2*margin)
-    
-    # Title and other details for Cover Page
-    title_y = page_height * 0.65
-    tagline_y = page_height * 0.55
-    summary_y = page_height * 0.45
-    date_y = page_height * 0.35
-
-    c.setFillColorRGB(0, 0, 0)
-    c.setFont("Helvetica-Bold", 20)
-    c.drawCentredString(page_width / 2, title_y, "WhatsApp Chat Analyzer Report")
-    
-    c.setFont("Helvetica", 14)
-    c.drawCentredString(page_width / 2, tagline_y, "Unlocking your chat insights")
-    
-    c.setFont("Helvetica", 12)
-    c.drawCentredString(page_width / 2, summary_y, summary_text)
-    
-    current_date = datetime.now().strftime("%B %d, %Y")
-    c.setFont("Helvetica-Oblique", 10)
-    c.drawCentredString(page_width / 2, date_y, f"Report generated on {current_date}")
-    c.showPage()
-
-    # --- CHART PAGES ---
-    cols = 2
-    rows = 3
-    cell_width = (page_width - 2 * margin) / cols
-    cell_height = (page_height - 2 * margin) / rows
-    total_charts = len(charts)
-    
-    for i in range(0, total_charts, 6):
-        c.setLineWidth(2)
-        c.rect(margin, margin, page_width - 2*margin, page_height - 2*margin)
-        batch = charts[i:i+6]
-        for j, (chart_title, img_buffer) in enumerate(batch):
-            row = j // cols
-            col = j % cols
-            cell_x = margin + col * cell_width
-            cell_y = margin + (rows - row - 1) * cell_height
-
-            # Wrap the title text to keep it neat within each chart cell
-            lines = wrap_text(chart_title, max_chars=30)
-            c.setFont("Helvetica-Bold", 12)
-            line_y = cell_y + cell_height - 15
-            for line in lines:
-                c.drawCentredString(cell_x + cell_width/2, line_y, line)
-                line_y -= 14
-            title_height = 14 * len(lines) + 5
-
-            # Add chart image into the cell area
-            img_x = cell_x + 5
-            img_y = cell_y + 5
-            img_w = cell_width - 10
-            img_h = cell_height - title_height - 10
-            image = ImageReader(img_buffer)
-            c.drawImage(image, img_x, img_y, width=img_w, height=img_h)
-
-        # Last page thank you note
-        if i + len(batch) >= total_charts:
-            c.setFont("Helvetica-Bold", 12)
-            c.drawCentredString(page_width / 2, margin + 10, "Thank you for using WhatsApp Chat Analyzer!")
+def show_overview(selected_user, chat):
+    # ==========================
+    # CHAT AT A GLANCE (TOP STATISTICS)
+    # ==========================
+    st.title("Top Statistics")
+    st.subheader("(Chat at a Glance)")
+    num_messages, words, num_media_messages = helper.fetch_stats(selected_user, chat)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.header("Total Messages")
+        st.title(num_messages)
+    with col2:
+        st.header("Total Words")
+        st.title(words)
+    with col3:
+        st.header("Media Shared")
+        st.title(num_media_messages)
+    with col4:
+        st.header("Links Shared")
+        # Extracting the links is slow, so the count waits for the background link extraction
+        show_when_ready("the links", lambda links_per_domain: st.title(helper.count_links(selected_user, chat)),
+                        helper.links_per_domain, selected_user, chat)
+
+    # ==========================
+    # MOST BUSY USERS (Only for Overall Analysis)
+    # ==========================
+    if selected_user == 'Overall':
+        st.title("Most Busy Users")
+        st.subheader("(Top Chatter)")
+        x, new_df = helper.most_busy_users(chat)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.image(report.chart_png('most_busy_users', 'Overall', chat))
+        with col2:
+            st.dataframe(new_df, use_container_width=True)
+
+    # ---------------------------
+    # SILENT OBSERVERS (Only for Overall Analysis)
+    # ---------------------------
+    if selected_user == 'Overall':
+        st.title("Silent Observers List")
+        st.subheader("(Hidden Listeners)")
+        silent_list_df = helper.silent_observers(chat)
+        st.write("**Users with the lowest message counts:**")
+        st.dataframe(silent_list_df, use_container_width=True)
+
+def show_timelines(selected_user, chat, options):
+    # ==========================
+    # MONTHLY TIMELINE
+    # ==========================
+    st.title("Monthly Timeline")
+    st.subheader("(Monthly Moments)")
+    st.image(report.chart_png('monthly_timeline', selected_user, chat,
+                              start=options['range_start'], end=options['range_end']))
+
+    # ==========================
+    # DAILY TIMELINE
+    # ==========================
+    st.title("Daily Timeline")
+    st.subheader("(Daily Dialogues)")
+    # Long chats are downsampled (LTTB) to a fixed number of points, keeping peaks and dips visible
+    st.image(report.chart_png('daily_timeline', selected_user, chat, start=options['range_start'],
+                              end=options['range_end'], max_points=options['timeline_points']))
+
+    # ==========================
+    # ACTIVITY MAP: Peak Activity Days & Months
+    # ==========================
+    st.title("Activity Map")
+    st.subheader("(Peak Activity Zones)")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.header("Most Busy Day")
+        st.image(report.chart_png('busy_day', selected_user, chat))
+    with col2:
+        st.header("Most Busy Month")
+        st.image(report.chart_png('busy_month', selected_user, chat))
+
+    # ==========================
+    # WEEKLY ACTIVITY HEATMAP
+    # ==========================
+    st.title("Weekly Activity Map")
+    st.subheader("(Weekly Heatmap)")
+    st.image(report.chart_png('heatmap', selected_user, chat))
+
+def show_words(selected_user, chat):
+    # ==========================
+    # WORD CLOUD
+    # ==========================
+    st.title("Word Cloud")
+    st.subheader("(Word Wonderland)")
+    # The page shows a small cached preview; the PDF report uses the full-size image
+    wordcloud_preview = helper.wordcloud_png(selected_user, chat, size=300)
+    if wordcloud_preview is not None:
+        st.image(wordcloud_preview)
+    else:
+        st.warning("Not enough words for a word cloud.")
+
+    # ==========================
+    # MOST COMMON WORDS
+    # ==========================
+    st.title("Most Common Words")
+    st.subheader("(Key Conversations)")
+    st.image(report.chart_png('common_words', selected_user, chat))
+
+def show_engagement(selected_user, chat, options):
+    # ==========================
+    # ENGAGEMENT & RESPONSE TIME ANALYSIS
+    # ==========================
+    st.title("Engagement & Response Time Analysis")
+    st.subheader("(Engagement Breakdown)")
+    response_df = helper.response_time_analysis(selected_user, chat, cap_hours=options['response_cap'])
+    st.write("**Response Time (in hours) per User: mean, median (p50), p90 and p99:**")
+    st.dataframe(response_df, use_container_width=True)
+    with st.expander("Response times between pairs of users"):
+        st.dataframe(helper.response_pairs(selected_user, chat, cap_hours=options['response_cap']),
+                     use_container_width=True)
+
+    # ==========================
+    # CONVERSATION NETWORK GRAPH (Only for Overall Analysis)
+    # ==========================
+    if selected_user == 'Overall':
+        st.title("Conversation Network Graph")
+        st.subheader("(Chat Connections)")
+        st.image(report.chart_png('network', selected_user, chat, window_minutes=options['reply_window']))
+
+def show_emoji_and_links(selected_user, chat):
+    # ==========================
+    # LINK ANALYSIS
+    # ==========================
+    st.title("Link Analysis")
+    st.subheader("(Shared Links)")
+
+    def render_links(links_per_domain):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Links per Domain:**")
+            st.dataframe(links_per_domain, use_container_width=True)
+        with col2:
+            if selected_user == 'Overall':
+                st.write("**Links per User:**")
+                st.dataframe(helper.links_per_user(chat), use_container_width=True)
+            else:
+                st.write("**Links per Day:**")
+                st.dataframe(helper.link_timeline(selected_user, chat), use_container_width=True)
+    # Link extraction is slow on big chats; it runs in the background while the emojis show up
+    show_when_ready("the links", render_links, helper.links_per_domain, selected_user, chat)
+
+    # ==========================
+    # EMOJI ANALYSIS
+    # ==========================
+    st.title("Emoji Analysis")
+    st.subheader("(Emoji Insights)")
+    emoji_df = helper.emoji_helper(selected_user, chat)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.dataframe(emoji_df, use_container_width=True)
+    with col2:
+        emoji_chart_png = report.chart_png('emoji', selected_user, chat)
+        if emoji_chart_png is not None:
+            st.image(emoji_chart_png)
+        else:
+            st.warning("No emojis found in the chat.")
+
+def show_topics(selected_user, chat):
+    # ==========================
+    # TOPIC MODELING & KEYWORD EXTRACTION
+    # ==========================
+    st.title("Topic Modeling & Keyword Extraction")
+    st.subheader("(Topic Trends)")
+
+    def render_topics(topics):
+        st.write("**Discovered Topics:**")
+        st.write(topics)
+    show_when_ready("the topics", render_topics, helper.topic_modeling, selected_user, chat, num_topics=3)
+
+def show_sentiment(selected_user, chat):
+    # ==========================
+    # SENTIMENT ANALYSIS
+    # ==========================
+    st.title("Sentiment Analysis")
+    st.subheader("(Mood Overview)")
+
+    def render_sentiment(sentiment_df):
+        st.write("**Sentiment Counts and Percentages:**")
+        st.dataframe(sentiment_df, use_container_width=True)
+        st.image(report.chart_png('sentiment', selected_user, chat))
+
+        sentiment_trend_png = report.chart_png('sentiment_trend', selected_user, chat)
+        if sentiment_trend_png is not None:
+            st.write("**Average Polarity per Month:**")
+            st.image(sentiment_trend_png)
+
+        if selected_user == 'Overall':
+            st.write("**Sentiment per User:**")
+            st.dataframe(helper.user_sentiment(chat), use_container_width=True)
+    show_when_ready("the sentiment", render_sentiment, helper.sentiment_analysis, selected_user, chat)
+
+def show_report(selected_user, chat, options):
+    def render_report(sentiment_df):
+        num_messages, words, num_media_messages = helper.fetch_stats(selected_user, chat)
+
+        # ==========================
+        # PDF REPORT DOWNLOAD
+        # ==========================
+        # The PDF is only built when the button is clicked, and kept in the result cache afterwards
+        appendix = st.checkbox("Include data tables appendix (statistics, top words, emojis, response times)")
+        st.download_button(
+            label="Download PDF - Get Your Visual Chat Report!",
+            data=lambda: report.build_report(
+                selected_user, chat, start=options['range_start'], end=options['range_end'],
+                max_points=options['timeline_points'], window_minutes=options['reply_window'],
+                cap_hours=options['response_cap'], appendix=appendix),
+            file_name="chat_analysis_visual_report.pdf",
+            mime="application/pdf"
+        )
+
+        # ==========================
+        # CONTEXTUAL INSIGHTS & RECOMMENDATIONS
+        # ==========================
+        st.title("Contextual Insights and Recommendations")
+        response_df = helper.response_time_analysis(selected_user, chat, cap_hours=options['response_cap'])
+        emoji_df = helper.emoji_helper(selected_user, chat)
+
+        with st.expander("Click here to reveal insights"):
+            insights = []
+
+            # Insight 1: Identify the Peak Activity Day and Hour
+            # Peak Day by message count, reduced from the chat's time cube
+            daily_counts = helper.daily_timeline('Overall', chat).set_index('only_date')['message']
+            if not daily_counts.empty:
+                peak_day = daily_counts.idxmax()
+                peak_messages = daily_counts.max()
+                insights.append(f"📅 **Peak Activity Day:** {peak_day.strftime('%A, %d %B %Y')} with {peak_messages} messages.")
+
+            # Peak Hour of the day by message count
+            hourly_counts = helper.hourly_activity('Overall', chat)
+            if hourly_counts.any():
+                peak_hour = hourly_counts.idxmax()
+                insights.append(f"⏰ **Peak Hour:** Around {peak_hour}:00 hrs with maximum activity.")
+
+            # Insight 2: Dominant Sentiment
+            sent_df = sentiment_df
+            if not sent_df.empty:
+                dominant_sent = sent_df.loc[sent_df['Count'].idxmax()]['Sentiment']
+                insights.append(f"😊 **Dominant Sentiment:** {dominant_sent}.")
+            
+            # Insight 3: Engagement Patterns
+            if not response_df.empty:
+                avg_response = response_df['response_time'].mean()
+                insights.append(f"⏱ **Average Response Time:** {round(avg_response, 2)} hours (lower is generally better for engagement).")
+            
+            # Insight 4: Emoji Vibes (if available)
+            if not emoji_df.empty:
+                top_emoji = emoji_df.iloc[0]
+                insights.append(f"😁 **Top Emoji:** {top_emoji['emoji']} used {top_emoji['count']} times, indicating a fun conversation!")
+
+            # Combine insights and add recommendations based on observed patterns
+            recommendations = []
             
-        c.showPage()
-    c.save()
-    buffer.seek(0)
-    return buffer
+            # Recommendation based on overall activity level
+            if num_messages < 100:
+                recommendations.append("It seems there is not much activity. Consider initiating more discussions to engage everyone!")
+            elif num_messages > 1000:
+                recommendations.append("High activity detected! You might want to highlight important messages or create sub-groups for focused discussions.")
+            else:
+                recommendations.append("The activity level looks balanced. Keep up the engaging conversations!")
+            
+            # Recommendation based on response time
+            if not response_df.empty and response_df['response_time'].mean() > 1:
+                recommendations.append("The average response time is a bit high. Encourage quicker responses to maintain the conversation flow.")
+            else:
+                recommendations.append("Response times are prompt, which is a good sign of active engagement!")
+            
+            # Recommendation based on sentiment
+            if not sent_df.empty and dominant_sent.lower() in ["negative", "sad"]:
+                recommendations.append("The dominant sentiment is negative. It might help to inject some positive topics or humor into the chat.")
+            else:
+                recommendations.append("The overall sentiment appears positive. Keep fostering that upbeat atmosphere!")
+            
+            # Display all insights
+            st.markdown("### Key Insights:")
+            for insight in insights:
+                st.markdown(f"- {insight}")
+            
+            # Display recommendations
+            st.markdown("### Recommendations:")
+            for rec in recommendations:
+                st.markdown(f"- {rec}")
+
+        st.title("Thanks for using WhatsApp Chat Analyzer!")
+    # The report includes the sentiment chart and the number of links, so it waits for the background
+    # sentiment and link extraction jobs
+    def wait_for_links(sentiment_df):
+        show_when_ready("the report", lambda links_per_domain: render_report(sentiment_df),
+                        helper.links_per_domain, selected_user, chat)
+    show_when_ready("the report", wait_for_links, helper.sentiment_analysis, selected_user, chat)
+
+# ---------------------------
+# PERFORMANCE PANEL (optional stage profiler)
+# ---------------------------
+def show_performance_panel():
+    """
+    Shows the stages recorded by the profiler (parsing, analyses, chart renders) in the sidebar, with
+    JSON and JSON-lines exports. Stages of background analyses show up on the next rerun after they end.
+    """
+    with st.sidebar.expander("Performance", expanded=True):
+        st.write("**Slowest stages:**")
+        st.dataframe(profiler.summary(), use_container_width=True, hide_index=True)
+        with st.expander("Recent stage runs"):
+            st.dataframe(profiler.table(), use_container_width=True, hide_index=True)
+        st.download_button("Export JSON", data=profiler.export_json, file_name="profile.json",
+                           mime="application/json")
+        st.download_button("Export structured log", data=profiler.export_json_lines,
+                           file_name="profile.jsonl", mime="application/x-ndjson")
+        if st.button("Clear measurements"):
+            profiler.clear()
+            st.rerun()
+
+# Profiling is shared by every session of the server and tracing memory slows every analysis down, so it
+# is only switched on by the operator (CHAT_PROFILE=1); the checkbox just shows the panel in this session
+profile_stages = profiler.enabled and st.sidebar.checkbox(
+    "Performance panel", key="performance_panel",
+    help="Show the time, CPU and memory of every analysis stage, measured across all sessions of the server."
+)
 
 # ---------------------------
 # ACTUAL ANALYSIS SECTION
@@ -191,382 +463,91 @@ def generate_pdf_charts_report(charts, summary_text=""):
 if uploaded_file is not None:
     try:
         bytes_data = uploaded_file.getvalue()
-        data = bytes_data.decode("utf-8")
-        with st.spinner("Processing chat data..."):
-            df = preprocessor.preprocess(data)
+        # Parse each upload once per session; chat_cache also keeps it on disk when CHAT_CACHE_DIR is set
+        chat_key = chat_cache.chat_key(bytes_data)
+        if st.session_state.get("chat_key") != chat_key:
+            with st.spinner("Processing chat data..."):
+                st.session_state["chat_df"] = chat_cache.load_chat(bytes_data)
+                # Index the chat once; every helper slices users and masks through it. The upload's hash
+                # keys the shared result cache, so revisiting a user view skips recomputing it.
+                st.session_state["chat_index"] = helper.ChatIndex(st.session_state["chat_df"], fingerprint=chat_key)
+            st.session_state["chat_key"] = chat_key
+            st.session_state["show_analysis"] = False
+        df = st.session_state["chat_df"]
+        chat = st.session_state["chat_index"]
     except UnicodeDecodeError:
         st.error("Error: Unable to decode the uploaded file. Please upload a valid text file.")
+        st.stop()
+    except ValueError as e:
+        st.error(f"Error: {e}")
+        st.stop()
 
     if df.empty:
         st.error("Error: No messages found in the uploaded file.")
     else:
-        # Convert date column to datetime and extract time info
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'], errors='coerce')
-            df['time'] = df['date'].dt.strftime('%I:%M %p')
-        else:
-            st.error("Error: 'date' column not found in the DataFrame.")
-
         # Create a sorted user list with 'Overall' option at the top
         user_list = df['user'].unique().tolist()
         user_list.sort()
         user_list.insert(0, "Overall")
         selected_user = st.sidebar.selectbox("Show analysis based on users", user_list)
-
+        reply_window = st.sidebar.number_input(
+            "Reply window for the network graph (minutes, 0 = no limit)", min_value=0, value=0, step=5
+        )
+        # Zoom the timelines into a date range; it is re-aggregated from the chat's pre-counted activity
+        chat_days = chat.time_cube.days
+        timeline_range = st.sidebar.date_input(
+            "Timeline date range", value=(chat_days[0].date(), chat_days[-1].date()),
+            min_value=chat_days[0].date(), max_value=chat_days[-1].date()
+        )
+        # While only the first date of a new range has been picked, keep the range open-ended
+        range_start, range_end = (tuple(timeline_range) + (None, None))[:2]
+
+        # Replies after long pauses (e.g. the next morning) are not really responses
+        response_cap = st.sidebar.number_input(
+            "Ignore response times above (hours, 0 = no limit)", min_value=0, value=12, step=1
+        )
+        options = {
+            'reply_window': reply_window or None,
+            'range_start': range_start,
+            'range_end': range_end,
+            # Most points drawn in the daily timeline, whatever the length of the chat
+            'timeline_points': 500,
+            'response_cap': response_cap or None,
+        }
+
+        # The analysis stays on screen across reruns (switching tabs, users or options) once requested
         if st.sidebar.button("Show Analysis"):
-
-            # ==========================
-            # CHAT AT A GLANCE (TOP STATISTICS)
-            # ==========================
-            st.title("Top Statistics")
-            st.subheader("(Chat at a Glance)")
-            num_messages, words, num_media_messages, num_links = helper.fetch_stats(selected_user, df)
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.header("Total Messages")
-                st.title(num_messages)
-            with col2:
-                st.header("Total Words")
-                st.title(words)
-            with col3:
-                st.header("Media Shared")
-                st.title(num_media_messages)
-            with col4:
-                st.header("Links Shared")
-                st.title(num_links)
-
-            # ==========================
-            # MONTHLY TIMELINE
-            # ==========================
-            st.title("Monthly Timeline")
-            st.subheader("(Monthly Moments)")
-            timeline = helper.monthly_timeline(selected_user, df)
-            try:
-                timeline['time'] = pd.to_datetime(timeline['time'], errors='coerce')
-            except Exception as e:
-                st.error("Error converting timeline time: " + str(e))
-            fig_monthly, ax = plt.subplots()
-            sns.lineplot(x="time", y="message", data=timeline, marker="o", color="red", ax=ax)
-            ax.set_title("Monthly Timeline (Monthly Moments)", fontsize=14, fontweight='bold')
-            ax.set_xlabel("Month", fontsize=12)
-            ax.set_ylabel("Number of Messages", fontsize=12)
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            st.pyplot(fig_monthly)
-
-            # ==========================
-            # DAILY TIMELINE
-            # ==========================
-            st.title("Daily Timeline")
-            st.subheader("(Daily Dialogues)")
-            daily_timeline = helper.daily_timeline(selected_user, df)
-            fig_daily, ax = plt.subplots()
-            sns.lineplot(x="only_date", y="message", data=daily_timeline, marker="o", color="blue", ax=ax)
-            ax.set_title("Daily Timeline (Daily Dialogues)", fontsize=14, fontweight='bold')
-            ax.set_xlabel("Date", fontsize=12)
-            ax.set_ylabel("Number of Messages", fontsize=12)
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            st.pyplot(fig_daily)
-
-            # ==========================
-            # ACTIVITY MAP: Peak Activity Days & Months
-            # ==========================
-            st.title("Activity Map")
-            st.subheader("(Peak Activity Zones)")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.header("Most Busy Day")
-                busy_day = helper.week_activity_map(selected_user, df)
-                fig_busy_day, ax = plt.subplots()
-                ax.bar(busy_day.index, busy_day.values, color='green')
-                plt.xticks(rotation='vertical')
-                ax.set_title("Most Busy Day", fontsize=12, fontweight='bold')
-                st.pyplot(fig_busy_day)
-            with col2:
-                st.header("Most Busy Month")
-                busy_month = helper.month_activity_map(selected_user, df)
-                fig_busy_month, ax = plt.subplots()
-                ax.bar(busy_month.index, busy_month.values, color='orange')
-                plt.xticks(rotation='vertical')
-                ax.set_title("Most Busy Month", fontsize=12, fontweight='bold')
-                st.pyplot(fig_busy_month)
-
-            # ==========================
-            # WEEKLY ACTIVITY HEATMAP
-            # ==========================
-            st.title("Weekly Activity Map")
-            st.subheader("(Weekly Heatmap)")
-            user_heatmap = helper.activity_heatmap(selected_user, df)
-            fig_heatmap, ax = plt.subplots()
-            ax = sns.heatmap(user_heatmap, annot=True, fmt=".0f", cmap="YlGnBu")
-            ax.set_title("Weekly Activity Heatmap", fontsize=12, fontweight='bold')
-            st.pyplot(fig_heatmap)
-
-            # ==========================
-            # MOST BUSY USERS (Only for Overall Analysis)
-            # ==========================
-            if selected_user == 'Overall':
-                st.title("Most Busy Users")
-                st.subheader("(Top Chatter)")
-                x, new_df = helper.most_busy_users(df)
-                fig_most_busy, ax = plt.subplots()
-                col1, col2 = st.columns(2)
-                with col1:
-                    ax.bar(x.index, x.values, color='red')
-                    plt.xticks(rotation='vertical')
-                    ax.set_title("Most Busy Users", fontsize=12, fontweight='bold')
-                    st.pyplot(fig_most_busy)
-                with col2:
-                    st.dataframe(new_df, use_container_width=True)
-
-            # ==========================
-            # WORD CLOUD
-            # ==========================
-            st.title("Word Cloud")
-            st.subheader("(Word Wonderland)")
-            df_wc = helper.create_wordcloud(selected_user, df)
-            fig_wordcloud, ax = plt.subplots()
-            ax.imshow(df_wc, interpolation="bilinear")
-            ax.axis("off")
-            st.pyplot(fig_wordcloud)
-
-            # ==========================
-            # MOST COMMON WORDS
-            # ==========================
-            st.title("Most Common Words")
-            st.subheader("(Key Conversations)")
-            most_common_df = helper.most_common_words(selected_user, df)
-            fig_common_words, ax = plt.subplots()
-            ax.barh(most_common_df[0], most_common_df[1], color='teal')
-            plt.xticks(rotation='vertical')
-            ax.set_title("Most Common Words", fontsize=12, fontweight='bold')
-            st.pyplot(fig_common_words)
-
-            # ==========================
-            # ENGAGEMENT & RESPONSE TIME ANALYSIS
-            # ==========================
-            st.title("Engagement & Response Time Analysis")
-            st.subheader("(Engagement Breakdown)")
-            response_df = helper.response_time_analysis(selected_user, df)
-            st.write("**Average Response Time (in hours) per User:**")
-            st.dataframe(response_df, use_container_width=True)
-
-            # ---------------------------
-            # SILENT OBSERVERS (Only for Overall Analysis)
-            # ---------------------------
-            if selected_user == 'Overall':
-                st.title("Silent Observers List")
-                st.subheader("(Hidden Listeners)")
-                silent_list_df = helper.silent_observers(df)
-                st.write("**Users with the lowest message counts:**")
-                st.dataframe(silent_list_df, use_container_width=True)
-
-            # ==========================
-            # EMOJI ANALYSIS
-            # ==========================
-            st.title("Emoji Analysis")
-            st.subheader("(Emoji Insights)")
-            emoji_df = helper.emoji_helper(selected_user, df)
-            col1, col2 = st.columns(2)
-            with col1:
-                st.dataframe(emoji_df, use_container_width=True)
-            with col2:
-                fig_emoji = None
-                if not emoji_df.empty:
-                    fig_emoji, ax = plt.subplots()
-                    num = min(5, len(emoji_df))
-                    ax.pie(emoji_df["count"].head(num), labels=emoji_df["emoji"].head(num), autopct="%0.2f")
-                    plt.setp(ax.texts, fontname="Segoe UI Emoji")
-                    ax.set_title("Top Emojis", fontsize=12, fontweight='bold')
-                    st.pyplot(fig_emoji)
-                else:
-                    st.warning("No emojis found in the chat.")
-
-            # ==========================
-            # CONVERSATION NETWORK GRAPH (Only for Overall Analysis)
-            # ==========================
-            if selected_user == 'Overall':
-                st.title("Conversation Network Graph")
-                st.subheader("(Chat Connections)")
-                graph = helper.conversation_network_graph(selected_user, df)
-                fig_network, ax = plt.subplots(figsize=(8, 6))
-                pos = nx.spring_layout(graph, k=0.5)
-                nx.draw_networkx_nodes(graph, pos, node_color='orange', node_size=500, ax=ax)
-                nx.draw_networkx_edges(graph, pos, edge_color='lightblue', width=2, ax=ax)
-                nx.draw_networkx_labels(graph, pos, font_color='black', ax=ax)
-                ax.set_title("Conversation Network Graph", fontsize=12, fontweight='bold')
-                plt.axis("off")
-                st.pyplot(fig_network)
-
-            # ==========================
-            # TOPIC MODELING & KEYWORD EXTRACTION
-            # ==========================
-            st.title("Topic Modeling & Keyword Extraction")
-            st.subheader("(Topic Trends)")
-            topics = helper.topic_modeling(selected_user, df, num_topics=3)
-            st.write("**Discovered Topics:**")
-            st.write(topics)
-
-            # ==========================
-            # SENTIMENT ANALYSIS
-            # ==========================
-            st.title("Sentiment Analysis")
-            st.subheader("(Mood Overview)")
-            sentiment_df = helper.sentiment_analysis(selected_user, df)
-            st.write("**Sentiment Counts and Percentages:**")
-            st.dataframe(sentiment_df, use_container_width=True)
-            fig_sentiment, ax = plt.subplots()
-            ax.pie(
-                sentiment_df['Count'],
-                labels=sentiment_df['Sentiment'],
-                autopct='%1.1f%%',
-                startangle=140
-            )
-            ax.axis('equal')
-            ax.set_title("Sentiment Analysis", fontsize=12, fontweight='bold')
-            st.pyplot(fig_sentiment)
-
-            st.title("Thanks for using WhatsApp Chat Analyzer!")
-
-            # ==========================
-            # PREPARE SUMMARY FOR COVER PAGE
-            # ==========================
-            summary_text = f"Total Messages: {num_messages} | Total Words: {words} | Media Shared: {num_media_messages} | Links Shared: {num_links}"
-
-            # ==========================
-            # CAPTURE CHARTS AS IMAGES FOR PDF REPORT
-            # ==========================
-            charts_list = []
-            buf = io.BytesIO()
-            fig_monthly.savefig(buf, format="PNG")
-            buf.seek(0)
-            charts_list.append(("Monthly Timeline (Monthly Moments)", buf))
-
-            buf = io.BytesIO()
-            fig_daily.savefig(buf, format="PNG")
-            buf.seek(0)
-            charts_list.append(("Daily Timeline (Daily Dialogues)", buf))
-
-            buf = io.BytesIO()
-            fig_busy_day.savefig(buf, format="PNG")
-            buf.seek(0)
-            charts_list.append(("Most Busy Day (Peak Activity Zones)", buf))
-
-            buf = io.BytesIO()
-            fig_busy_month.savefig(buf, format="PNG")
-            buf.seek(0)
-            charts_list.append(("Most Busy Month (Peak Activity Zones)", buf))
-
-            buf = io.BytesIO()
-            fig_heatmap.savefig(buf, format="PNG")
-            buf.seek(0)
-            charts_list.append(("Weekly Activity Heatmap (Weekly Heatmap)", buf))
-
-            buf = io.BytesIO()
-            fig_wordcloud.savefig(buf, format="PNG")
-            buf.seek(0)
-            charts_list.append(("Word Cloud (Word Wonderland)", buf))
-
-            buf = io.BytesIO()
-            fig_common_words.savefig(buf, format="PNG")
-            buf.seek(0)
-            charts_list.append(("Most Common Words (Key Conversations)", buf))
-
-            if fig_emoji is not None:
-                buf = io.BytesIO()
-                fig_emoji.savefig(buf, format="PNG")
-                buf.seek(0)
-                charts_list.append(("Emoji Analysis (Emoji Insights)", buf))
-
-            if selected_user == 'Overall':
-                buf = io.BytesIO()
-                fig_network.savefig(buf, format="PNG")
-                buf.seek(0)
-                charts_list.append(("Conversation Network Graph (Chat Connections)", buf))
-
-            buf = io.BytesIO()
-            fig_sentiment.savefig(buf, format="PNG")
-            buf.seek(0)
-            charts_list.append(("Sentiment Analysis (Mood Overview)", buf))
-
-            # Generate and provide PDF download button
-            pdf_buffer = generate_pdf_charts_report(charts_list, summary_text=summary_text)
-            st.download_button(
-                label="Download PDF - Get Your Visual Chat Report!",
-                data=pdf_buffer,
-                file_name="chat_analysis_visual_report.pdf",
-                mime="application/pdf"
+            st.session_state["show_analysis"] = True
+
+        if st.session_state.get("show_analysis"):
+            # Start the slow analyses right away, so they are ready (or close) when their tab is opened
+            start_in_background(helper.sentiment_analysis, selected_user, chat)
+            start_in_background(helper.links_per_domain, selected_user, chat)
+            start_in_background(helper.topic_modeling, selected_user, chat, num_topics=3)
+
+            # Only the open tab is computed and rendered; the others cost nothing until selected
+            sections = {
+                "Overview": lambda: show_overview(selected_user, chat),
+                "Timelines": lambda: show_timelines(selected_user, chat, options),
+                "Words": lambda: show_words(selected_user, chat),
+                "Emoji & Links": lambda: show_emoji_and_links(selected_user, chat),
+                "Engagement": lambda: show_engagement(selected_user, chat, options),
+                "Topics": lambda: show_topics(selected_user, chat),
+                "Sentiment": lambda: show_sentiment(selected_user, chat),
+                "Report & Insights": lambda: show_report(selected_user, chat, options),
+            }
+            tabs = st.tabs(list(sections), key="analysis_tab", on_change="rerun")
+            for tab, show_section in zip(tabs, sections.values()):
+                if tab.open:
+                    with tab:
+                        show_section()
+
+            # Result cache counters, shared by every session served by this process
+            cache_stats = result_cache.stats()
+            st.sidebar.caption(
+                f"Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                f"{cache_stats['entries']} results ({cache_stats['bytes'] / 1024 ** 2:.1f} MB)"
             )
 
-            # ==========================
-            # CONTEXTUAL INSIGHTS & RECOMMENDATIONS
-            # ==========================
-            st.title("Contextual Insights and Recommendations")
-
-            with st.expander("Click here to reveal insights"):
-                insights = []
-
-                # Insight 1: Identify the Peak Activity Day and Hour
-                if not df.empty:
-                    # Peak Day by message count
-                    daily_counts = df.groupby(df['date'].dt.date).size()
-                    if not daily_counts.empty:
-                        peak_day = daily_counts.idxmax()
-                        peak_messages = daily_counts.max()
-                        insights.append(f"📅 **Peak Activity Day:** {peak_day.strftime('%A, %d %B %Y')} with {peak_messages} messages.")
-                    
-                    # Peak Hour of the day by message count
-                    hourly_counts = df['hour'].value_counts()
-                    if not hourly_counts.empty:
-                        peak_hour = hourly_counts.idxmax()
-                        insights.append(f"⏰ **Peak Hour:** Around {peak_hour}:00 hrs with maximum activity.")
-
-                # Insight 2: Dominant Sentiment
-                sent_df = helper.sentiment_analysis(selected_user, df)
-                if not sent_df.empty:
-                    dominant_sent = sent_df.loc[sent_df['Count'].idxmax()]['Sentiment']
-                    insights.append(f"😊 **Dominant Sentiment:** {dominant_sent}.")
-                
-                # Insight 3: Engagement Patterns
-                if not response_df.empty:
-                    avg_response = response_df['response_time'].mean()
-                    insights.append(f"⏱ **Average Response Time:** {round(avg_response, 2)} hours (lower is generally better for engagement).")
-                
-                # Insight 4: Emoji Vibes (if available)
-                if not emoji_df.empty:
-                    top_emoji = emoji_df.iloc[0]
-                    insights.append(f"😁 **Top Emoji:** {top_emoji['emoji']} used {top_emoji['count']} times, indicating a fun conversation!")
-
-                # Combine insights and add recommendations based on observed patterns
-                recommendations = []
-                
-                # Recommendation based on overall activity level
-                if num_messages < 100:
-                    recommendations.append("It seems there is not much activity. Consider initiating more discussions to engage everyone!")
-                elif num_messages > 1000:
-                    recommendations.append("High activity detected! You might want to highlight important messages or create sub-groups for focused discussions.")
-                else:
-                    recommendations.append("The activity level looks balanced. Keep up the engaging conversations!")
-                
-                # Recommendation based on response time
-                if not response_df.empty and response_df['response_time'].mean() > 1:
-                    recommendations.append("The average response time is a bit high. Encourage quicker responses to maintain the conversation flow.")
-                else:
-                    recommendations.append("Response times are prompt, which is a good sign of active engagement!")
-                
-                # Recommendation based on sentiment
-                if not sent_df.empty and dominant_sent.lower() in ["negative", "sad"]:
-                    recommendations.append("The dominant sentiment is negative. It might help to inject some positive topics or humor into the chat.")
-                else:
-                    recommendations.append("The overall sentiment appears positive. Keep fostering that upbeat atmosphere!")
-                
-                # Display all insights
-                st.markdown("### Key Insights:")
-                for insight in insights:
-                    st.markdown(f"- {insight}")
-                
-                # Display recommendations
-                st.markdown("### Recommendations:")
-                for rec in recommendations:
-                    st.markdown(f"- {rec}")
+if profile_stages:
+    show_performance_panel()
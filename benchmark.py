@@ -0,0 +1,236 @@
+"""
+Benchmarks of the parser and every analysis on synthetic exports of increasing size.
+
+For each size, a deterministic export from `synthetic` is parsed with `preprocessor.preprocess`, then
+every `helper` analysis is run on its own fresh ChatIndex with an empty result cache, so each timing
+includes the index work the analysis needs (e.g., sentiment scoring or URL extraction); the on-disk
+chat cache is turned off, so saved topic models are not reused either. Wall time and
+CPU time are the best of `--repeat` runs; peak memory is traced with tracemalloc in one separate run,
+as tracing slows Python code down.
+
+Results are written as JSON. Saving them as a baseline and comparing a later run against it reports
+every timing that got slower than the threshold, and exits with status 1 if any did.
+
+Example:
+    python benchmark.py --sizes 10k,100k --save benchmarks/baseline.json
+    python benchmark.py --sizes 10k,100k --compare benchmarks/baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import preprocessor
+import helper
+import chat_cache
+import profiler
+import result_cache
+import synthetic
+
+# Version of the result layout; comparisons refuse baselines written with another version
+results_version = '1'
+
+# Every analysis, called as func(user, chat) where it takes a selected user and func(chat) otherwise
+analyses = {
+    'fetch_stats': (helper.fetch_stats, True, {}),
+    'count_links': (helper.count_links, True, {}),
+    'most_busy_users': (helper.most_busy_users, False, {}),
+    'word_frequencies': (helper.word_frequencies, True, {}),
+    'create_wordcloud': (helper.create_wordcloud, True, {}),
+    'wordcloud_png': (helper.wordcloud_png, True, {}),
+    'most_common_words': (helper.most_common_words, True, {}),
+    'emoji_helper': (helper.emoji_helper, True, {}),
+    'monthly_timeline': (helper.monthly_timeline, True, {}),
+    'daily_timeline': (helper.daily_timeline, True, {'max_points': 500}),
+    'hourly_activity': (helper.hourly_activity, True, {}),
+    'week_activity_map': (helper.week_activity_map, True, {}),
+    'month_activity_map': (helper.month_activity_map, True, {}),
+    'activity_heatmap': (helper.activity_heatmap, True, {}),
+    'sentiment_analysis': (helper.sentiment_analysis, True, {}),
+    'user_sentiment': (helper.user_sentiment, False, {}),
+    'sentiment_timeline': (helper.sentiment_timeline, True, {}),
+    'conversation_network_graph': (helper.conversation_network_graph, True, {}),
+    'conversation_graph_layout': (helper.conversation_graph_layout, True, {}),
+    'topic_modeling': (helper.topic_modeling, True, {'num_topics': 3}),
+    'response_time_analysis': (helper.response_time_analysis, True, {}),
+    'response_pairs': (helper.response_pairs, True, {}),
+    'silent_observers': (helper.silent_observers, False, {}),
+    'links_per_user': (helper.links_per_user, False, {}),
+    'links_per_domain': (helper.links_per_domain, True, {}),
+    'link_timeline': (helper.link_timeline, True, {}),
+}
+
+
+# --------------------- 1. Measurements ---------------------
+def parse_size(text):
+    """
+    Parses a message count such as '10k', '1m' or '2500'.
+    """
+    text = text.strip().lower()
+    scale = {'k': 10**3, 'm': 10**6}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+def measure(func, repeat=1, memory=True):
+    """
+    Calls `func()` `repeat` times and returns (result, best wall seconds, best CPU seconds, peak bytes).
+    The peak is traced with tracemalloc in one extra call, or None if `memory` is False.
+    """
+    wall = cpu = float('inf')
+    for _ in range(repeat):
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        result = func()
+        wall = min(wall, time.perf_counter() - start_wall)
+        cpu = min(cpu, time.process_time() - start_cpu)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, wall, cpu, peak
+
+def export_path(data_dir, size, options):
+    """
+    Returns the path of the synthetic export for a size and generator options, writing it if needed.
+    """
+    name = '-'.join([f"v{synthetic.generator_version}", str(size)] +
+                    [f"{key}={value}" for key, value in sorted(options.items())])
+    path = os.path.join(data_dir, f"{name}.txt")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        synthetic.write_export(path + '.tmp', size, **options)
+        os.replace(path + '.tmp', path)
+    return path
+
+def run_size(size, options, names, data_dir, user='Overall', repeat=1, memory=True, log=print):
+    """
+    Benchmarks the parser and the named analyses on one export size. Returns a list of result records.
+    """
+    with open(export_path(data_dir, size, options), encoding='utf-8') as f:
+        data = f.read()
+    chat_cache.cache_dir = None
+    records = []
+
+    def record(name, measured):
+        result, wall, cpu, peak = measured
+        records.append({'size': size, 'name': name, 'wall_seconds': round(wall, 6),
+                        'cpu_seconds': round(cpu, 6), 'peak_bytes': peak, 'rows': profiler.row_count(result)})
+        log(f"{size:>10,} {name:<28} {wall:9.3f}s wall {cpu:9.3f}s cpu"
+            + (f" {peak / 2**20:9.1f} MB peak" if peak is not None else ""))
+        return result
+
+    df = record('preprocess', measure(lambda: preprocessor.preprocess(data), repeat, memory))
+    del data
+    for name in names:
+        func, takes_user, kwargs = analyses[name]
+        args = (user,) if takes_user else ()
+
+        def call():
+            # A fresh index and an empty result cache, so nothing computed by an earlier run is reused
+            result_cache.clear()
+            return func(*args, helper.ChatIndex(df), **kwargs)
+        record(name, measure(call, repeat, memory))
+    result_cache.clear()
+    return records
+
+
+# --------------------- 2. Baselines ---------------------
+def machine_info():
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpu_count': os.cpu_count(), 'pandas': pd.__version__}
+
+def compare(results, baseline, threshold=0.2, metric='wall_seconds', min_seconds=0.1):
+    """
+    Compares results against a baseline. Returns (name, size, baseline value, new value, ratio) for
+    every measurement that is more than `threshold` slower (or larger, for 'peak_bytes').
+    Measurements under `min_seconds` in both runs are ignored, being mostly noise.
+    """
+    if baseline.get('version') != results_version:
+        raise ValueError(f"Baseline was written with results version {baseline.get('version')}, "
+                         f"expected {results_version}")
+    old = {(r['name'], r['size']): r for r in baseline['results']}
+    regressions = []
+    for r in results['results']:
+        before = old.get((r['name'], r['size']))
+        if before is None or before.get(metric) is None or r.get(metric) is None:
+            continue
+        if metric != 'peak_bytes' and max(before[metric], r[metric]) < min_seconds:
+            continue
+        ratio = r[metric] / before[metric] if before[metric] else float('inf')
+        if ratio > 1 + threshold:
+            regressions.append((r['name'], r['size'], before[metric], r[metric], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the parser and the analyses on synthetic exports.")
+    parser.add_argument('--sizes', default='10k,100k',
+                        help="Comma-separated message counts, e.g. 10k,100k,1m,10m")
+    parser.add_argument('--functions', default='all',
+                        help="Comma-separated analyses to run after parsing, 'all' or 'none'")
+    parser.add_argument('--user', default='Overall', help="Selected user passed to the analyses")
+    parser.add_argument('--repeat', type=int, default=1, help="Timed runs per measurement (best is kept)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak memory run")
+    parser.add_argument('--participants', type=int, default=8, help="Users in the synthetic chats")
+    parser.add_argument('--dialect', choices=sorted(synthetic.dialects), default='android-12h',
+                        help="Date-time format of the synthetic chats")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic chats")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'whatsapp-chat-benchmark'),
+                        help="Directory keeping the generated exports between runs")
+    parser.add_argument('--output', help="Write the results as JSON to this path")
+    parser.add_argument('--save', help="Write the results as a baseline to this path")
+    parser.add_argument('--compare', help="Baseline JSON to compare the results against")
+    parser.add_argument('--metric', choices=['wall_seconds', 'cpu_seconds', 'peak_bytes'], default='wall_seconds',
+                        help="Measurement compared against the baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative slowdown reported as a regression (0.2 = 20%%)")
+    parser.add_argument('--min-seconds', type=float, default=0.1,
+                        help="Ignore timings shorter than this in both runs when comparing")
+    args = parser.parse_args(argv)
+
+    if args.functions == 'all':
+        names = list(analyses)
+    elif args.functions == 'none':
+        names = []
+    else:
+        names = [name.strip() for name in args.functions.split(',') if name.strip()]
+        unknown = [name for name in names if name not in analyses]
+        if unknown:
+            parser.error(f"unknown analyses: {', '.join(unknown)}")
+    options = {'participants': args.participants, 'dialect': args.dialect, 'seed': args.seed}
+
+    records = []
+    for size in [parse_size(size) for size in args.sizes.split(',')]:
+        records += run_size(size, options, names, args.data_dir, user=args.user, repeat=args.repeat,
+                            memory=not args.no_memory)
+    results = {'version': results_version, 'generator_version': synthetic.generator_version,
+               'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'machine': machine_info(),
+               'options': options, 'results': records}
+
+    for path in filter(None, [args.output, args.save]):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('machine') != results['machine']:
+            print("Warning: the baseline was recorded on a different machine or environment.", file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold, args.metric, args.min_seconds)
+        for name, size, before, after, ratio in regressions:
+            print(f"REGRESSION {name} at {size:,} messages: {args.metric} {before:.4g} -> {after:.4g} ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions over {args.threshold:.0%} against {args.compare}.")
+
+
+if __name__ == '__main__':
+    main()
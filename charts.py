@@ -0,0 +1,145 @@
+"""
+Matplotlib drawings of the analysis charts, shared by the Streamlit tabs and the PDF report.
+
+Every drawing takes plain helper results (DataFrames, Series, graphs) rather than the chat itself, so
+charts can also be rendered in worker processes; `render_png` draws a chart, rasterizes it and closes
+the figure right away.
+"""
+import io
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+import pandas as pd
+import networkx as nx
+import profiler
+
+
+def monthly_timeline(timeline):
+    timeline = timeline.copy()
+    timeline['time'] = pd.to_datetime(timeline['time'], format='%B-%Y', errors='coerce')
+    fig_monthly, ax = plt.subplots()
+    sns.lineplot(x="time", y="message", data=timeline, marker="o", color="red", ax=ax)
+    ax.set_title("Monthly Timeline (Monthly Moments)", fontsize=14, fontweight='bold')
+    ax.set_xlabel("Month", fontsize=12)
+    ax.set_ylabel("Number of Messages", fontsize=12)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig_monthly.tight_layout()
+    return fig_monthly
+
+def daily_timeline(daily_timeline):
+    fig_daily, ax = plt.subplots()
+    sns.lineplot(x="only_date", y="message", data=daily_timeline,
+                 marker="o" if len(daily_timeline) <= 100 else None, color="blue", ax=ax)
+    ax.set_title("Daily Timeline (Daily Dialogues)", fontsize=14, fontweight='bold')
+    ax.set_xlabel("Date", fontsize=12)
+    ax.set_ylabel("Number of Messages", fontsize=12)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig_daily.tight_layout()
+    return fig_daily
+
+def busy_day(busy_day):
+    fig_busy_day, ax = plt.subplots()
+    ax.bar(busy_day.index, busy_day.values, color='green')
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.set_title("Most Busy Day", fontsize=12, fontweight='bold')
+    return fig_busy_day
+
+def busy_month(busy_month):
+    fig_busy_month, ax = plt.subplots()
+    ax.bar(busy_month.index, busy_month.values, color='orange')
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.set_title("Most Busy Month", fontsize=12, fontweight='bold')
+    return fig_busy_month
+
+def heatmap(user_heatmap):
+    fig_heatmap, ax = plt.subplots()
+    sns.heatmap(user_heatmap, annot=True, fmt=".0f", cmap="YlGnBu", ax=ax)
+    ax.set_title("Weekly Activity Heatmap", fontsize=12, fontweight='bold')
+    return fig_heatmap
+
+def most_busy_users(x):
+    fig_most_busy, ax = plt.subplots()
+    ax.bar(x.index, x.values, color='red')
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.set_title("Most Busy Users", fontsize=12, fontweight='bold')
+    return fig_most_busy
+
+def common_words(most_common_df):
+    fig_common_words, ax = plt.subplots()
+    ax.barh(most_common_df[0], most_common_df[1], color='teal')
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.set_title("Most Common Words", fontsize=12, fontweight='bold')
+    return fig_common_words
+
+def emoji(emoji_df):
+    if emoji_df.empty:
+        return None
+    fig_emoji, ax = plt.subplots()
+    num = min(5, len(emoji_df))
+    ax.pie(emoji_df["count"].head(num), labels=emoji_df["emoji"].head(num), autopct="%0.2f")
+    plt.setp(ax.texts, fontname="Segoe UI Emoji")
+    ax.set_title("Top Emojis", fontsize=12, fontweight='bold')
+    return fig_emoji
+
+def network(graph, pos):
+    fig_network, ax = plt.subplots(figsize=(8, 6))
+    nx.draw_networkx_nodes(graph, pos, node_color='orange', node_size=500, ax=ax)
+    nx.draw_networkx_edges(graph, pos, edge_color='lightblue', width=2, ax=ax)
+    nx.draw_networkx_labels(graph, pos, font_color='black', ax=ax)
+    ax.set_title("Conversation Network Graph", fontsize=12, fontweight='bold')
+    ax.axis("off")
+    return fig_network
+
+def sentiment(sentiment_df):
+    fig_sentiment, ax = plt.subplots()
+    ax.pie(
+        sentiment_df['Count'],
+        labels=sentiment_df['Sentiment'],
+        autopct='%1.1f%%',
+        startangle=140
+    )
+    ax.axis('equal')
+    ax.set_title("Sentiment Analysis", fontsize=12, fontweight='bold')
+    return fig_sentiment
+
+def sentiment_trend(sentiment_trend):
+    if sentiment_trend.empty:
+        return None
+    fig, ax = plt.subplots()
+    ax.plot(sentiment_trend['time'], sentiment_trend['polarity'], color='purple')
+    ax.axhline(0, color='grey', linewidth=0.8)
+    ax.tick_params(axis='x', labelrotation=90)
+    return fig
+
+# Every chart by name, as used by `render_png`
+drawings = {
+    'monthly_timeline': monthly_timeline,
+    'daily_timeline': daily_timeline,
+    'busy_day': busy_day,
+    'busy_month': busy_month,
+    'heatmap': heatmap,
+    'most_busy_users': most_busy_users,
+    'common_words': common_words,
+    'emoji': emoji,
+    'network': network,
+    'sentiment': sentiment,
+    'sentiment_trend': sentiment_trend,
+}
+
+
+def render_png(chart, data, dpi=150):
+    """
+    Draws a chart from its data (the positional arguments of its drawing function) and returns it as
+    PNG bytes, or None if there is nothing to plot. The figure is closed as soon as it is rasterized.
+    """
+    with profiler.stage(f"render {chart}", profiler.row_count(data[0])):
+        fig = drawings[chart](*data)
+        if fig is None:
+            return None
+        try:
+            buf = io.BytesIO()
+            fig.savefig(buf, format="PNG", dpi=dpi, bbox_inches="tight")
+            return buf.getvalue()
+        finally:
+            plt.close(fig)
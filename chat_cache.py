@@ -0,0 +1,89 @@
+import hashlib
+import io
+import os
+import tempfile
+import pandas as pd
+import preprocessor
+import profiler
+
+# Directory for cached parsed chats; caching is disabled unless it is configured, because the app
+# promises not to keep uploaded chats. Set CHAT_CACHE_DIR to enable it on a trusted server.
+cache_dir = os.environ.get('CHAT_CACHE_DIR')
+
+# Upper bound on the total size of the cache directory; least recently used chats are evicted first
+max_cache_bytes = int(os.environ.get('CHAT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+def chat_key(data):
+    """
+    Returns the cache key of an uploaded chat: a SHA-256 hash of the parser version and the raw bytes.
+    Bumping `preprocessor.parser_version` therefore invalidates every cached chat automatically.
+    """
+    digest = hashlib.sha256(preprocessor.parser_version.encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+@profiler.profiled()
+def load_chat(data, directory=None, max_bytes=None):
+    """
+    Returns the processed DataFrame for the raw bytes of an uploaded chat export.
+
+    If a cache directory is configured and the chat has been parsed before, the typed DataFrame is read
+    back from its Parquet file instead of being parsed again. Otherwise the export (.txt or .zip) is
+    parsed with `preprocessor.read_export` and, if caching is enabled, written to the cache.
+
+    Parameters:
+        data (bytes): The raw bytes of the uploaded chat export.
+        directory (str, optional): Cache directory; defaults to `cache_dir`. Caching is off if neither is set.
+        max_bytes (int, optional): Size limit of the cache directory; defaults to `max_cache_bytes`.
+
+    Returns:
+        DataFrame: The processed chat data.
+    """
+    directory = directory or cache_dir
+    if not directory:
+        return preprocessor.read_export(io.BytesIO(data))
+
+    path = os.path.join(directory, chat_key(data) + '.parquet')
+    try:
+        df = pd.read_parquet(path)
+        # Refresh the modification time, which orders the files for LRU eviction
+        os.utime(path)
+        return df
+    except (FileNotFoundError, OSError, ValueError):
+        pass
+
+    df = preprocessor.read_export(io.BytesIO(data))
+    os.makedirs(directory, exist_ok=True)
+    # Write to a temporary file first so readers never see a half-written Parquet file
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict(directory, max_bytes if max_bytes is not None else max_cache_bytes)
+    return df
+
+
+def evict(directory, max_bytes):
+    """
+    Deletes the least recently used cached chats until the directory holds at most `max_bytes`.
+    """
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.parquet'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,255 @@
+"""
+Headless batch analysis of WhatsApp chat exports.
+
+Runs `preprocessor.read_export` and the selected `helper` analyses over a directory or glob of exports
+(.txt or .zip) in a process pool, writing one JSON or Parquet result set per chat. Completed chats are
+recorded in a manifest inside the output directory, so an interrupted run can simply be started again
+and skips the chats that are already done.
+
+Example:
+    python cli.py "exports/*.zip" --output results --workers 8 --sections stats,emoji --users Overall,all
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import preprocessor
+import helper
+
+# Name of the resumable manifest written inside the output directory (one JSON line per finished chat)
+manifest_name = 'manifest.jsonl'
+
+
+# --------------------- 1. Section Tables ---------------------
+def stats_tables(selected_user, chat):
+    num_messages, words, num_media_messages = helper.fetch_stats(selected_user, chat)
+    num_links = helper.count_links(selected_user, chat)
+    return {'stats': pd.DataFrame([{
+        'messages': num_messages, 'words': words, 'media': num_media_messages, 'links': num_links
+    }])}
+
+def timeline_tables(selected_user, chat):
+    heatmap = helper.activity_heatmap(selected_user, chat)
+    return {
+        'monthly_timeline': helper.monthly_timeline(selected_user, chat),
+        'daily_timeline': helper.daily_timeline(selected_user, chat),
+        'week_activity': helper.week_activity_map(selected_user, chat).rename_axis('day_name').reset_index(name='messages'),
+        'month_activity': helper.month_activity_map(selected_user, chat).rename_axis('month').reset_index(name='messages'),
+        'activity_heatmap': heatmap.rename_axis(index='day_name', columns='period').stack().reset_index(name='messages'),
+    }
+
+def emoji_tables(selected_user, chat):
+    return {'emoji': helper.emoji_helper(selected_user, chat)}
+
+def sentiment_tables(selected_user, chat):
+    return {'sentiment': helper.sentiment_analysis(selected_user, chat)}
+
+def response_time_tables(selected_user, chat):
+    return {
+        'response_time': helper.response_time_analysis(selected_user, chat),
+        'response_pairs': helper.response_pairs(selected_user, chat),
+    }
+
+def link_tables(selected_user, chat):
+    return {
+        'links_per_domain': helper.links_per_domain(selected_user, chat),
+        'link_timeline': helper.link_timeline(selected_user, chat),
+    }
+
+def topic_tables(selected_user, chat):
+    topics = helper.topic_modeling(selected_user, chat)
+    if isinstance(topics, str):
+        topics = []
+    return {'topics': pd.DataFrame({'topic': topics})}
+
+# Every section that can be selected with --sections, mapped to the function building its tables
+sections = {
+    'stats': stats_tables,
+    'timelines': timeline_tables,
+    'emoji': emoji_tables,
+    'sentiment': sentiment_tables,
+    'response_time': response_time_tables,
+    'links': link_tables,
+    'topics': topic_tables,
+}
+
+
+# --------------------- 2. Per-Chat Analysis ---------------------
+def analyze_chat(path, users, section_names):
+    """
+    Parses one export and runs the selected sections for every requested user.
+
+    Parameters:
+        path (str): Path of the export (.txt or .zip).
+        users (list): User names to analyze; "Overall" is the whole chat and "all" expands to every participant.
+        section_names (list): Keys of `sections` to run.
+
+    Returns:
+        dict: Table name -> DataFrame, where every table has a leading "selected_user" column.
+    """
+    df = preprocessor.read_export(path)
+    chat = helper.ChatIndex(df)
+    participants = [user for user in df['user'].unique().tolist() if user != 'group_notification']
+    selected = []
+    for user in users:
+        for name in (sorted(participants) if user == 'all' else [user]):
+            if name not in selected and (name == 'Overall' or name in participants):
+                selected.append(name)
+
+    results = {}
+    for selected_user in selected:
+        for section in section_names:
+            for name, table in sections[section](selected_user, chat).items():
+                table = table.reset_index(drop=True)
+                table.insert(0, 'selected_user', selected_user)
+                results.setdefault(name, []).append(table)
+    return {name: pd.concat(tables, ignore_index=True) for name, tables in results.items()}
+
+def write_results(results, output, output_format):
+    """
+    Writes the tables of one chat either as a single JSON file or as a directory of Parquet files.
+    """
+    if output_format == 'json':
+        payload = {name: json.loads(table.to_json(orient='records', date_format='iso'))
+                   for name, table in results.items()}
+        with open(output + '.json', 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        return output + '.json'
+    os.makedirs(output, exist_ok=True)
+    for name, table in results.items():
+        # Mixed per-user categoricals and objects are stored as plain strings
+        for column in table.columns[table.dtypes == object]:
+            table[column] = table[column].astype(str)
+        table.to_parquet(os.path.join(output, name + '.parquet'), index=False)
+    return output
+
+def limit_worker_processes(workers):
+    """
+    Worker initializer: shares the CPUs between the chats analyzed at the same time, so the process pools
+    of the analyses (sentiment scoring, topic training) do not start a pool per chat on every CPU. Worker
+    processes are single-threaded, so topic training may fork its pool there.
+    """
+    helper.max_workers = max(1, (os.cpu_count() or 1) // workers)
+    helper.fork_workers = True
+
+def process_chat(path, output_dir, users, section_names, output_format):
+    """
+    Worker entry point: analyzes one chat and writes its result set, returning the result path.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    # A short hash of the full path and the options keeps equally named exports from different folders,
+    # and runs with different options, from overwriting each other's results
+    key = json.dumps([os.path.abspath(path), run_options(users, section_names, output_format)], sort_keys=True)
+    output = os.path.join(output_dir, f"{stem}-{hashlib.sha1(key.encode()).hexdigest()[:8]}")
+    return write_results(analyze_chat(path, users, section_names), output, output_format)
+
+
+# --------------------- 3. Manifest & Command Line ---------------------
+def run_options(users, section_names, output_format):
+    """
+    Returns the options that change a chat's results, normalized so their order does not matter.
+    """
+    return {'users': sorted(set(users)), 'sections': sorted(set(section_names)), 'format': output_format}
+
+def chat_signature(path, options):
+    """
+    Identifies a chat export in the manifest by its absolute path, size, modification time and the run
+    options, so a run with other sections, users or format does not skip chats done with different ones.
+    """
+    stat = os.stat(path)
+    return {'chat': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'options': options}
+
+def signature_key(signature):
+    return (signature['chat'], signature['size'], signature['mtime'],
+            json.dumps(signature.get('options'), sort_keys=True))
+
+def load_manifest(output_dir):
+    """
+    Returns the signatures of chats completed by earlier runs whose results still exist.
+    """
+    done = set()
+    try:
+        with open(os.path.join(output_dir, manifest_name), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write can leave a truncated last line
+                    continue
+                if os.path.exists(entry.get('output', '')):
+                    done.add(signature_key(entry))
+    except FileNotFoundError:
+        pass
+    return done
+
+def find_exports(inputs):
+    """
+    Expands directories and glob patterns into a sorted list of .txt and .zip export paths.
+    """
+    paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '**', '*')
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isfile(path) and path.lower().endswith(('.txt', '.zip')):
+                paths.add(path)
+    return sorted(paths)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze WhatsApp chat exports without the Streamlit UI.")
+    parser.add_argument('inputs', nargs='+', help="Directories or glob patterns of .txt/.zip exports")
+    parser.add_argument('-o', '--output', default='results', help="Output directory (default: results)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument('--users', default='Overall',
+                        help="Comma-separated users to analyze; 'Overall' is the whole chat, 'all' every participant")
+    parser.add_argument('--sections', default=','.join(sections),
+                        help=f"Comma-separated sections to run (default: all of {', '.join(sections)})")
+    parser.add_argument('--format', choices=['json', 'parquet'], default='json', help="Result format")
+    args = parser.parse_args(argv)
+
+    users = [user.strip() for user in args.users.split(',') if user.strip()]
+    section_names = [section.strip() for section in args.sections.split(',') if section.strip()]
+    unknown = [section for section in section_names if section not in sections]
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(unknown)}")
+
+    os.makedirs(args.output, exist_ok=True)
+    done = load_manifest(args.output)
+    options = run_options(users, section_names, args.format)
+    paths = find_exports(args.inputs)
+    pending = []
+    for path in paths:
+        signature = chat_signature(path, options)
+        if signature_key(signature) not in done:
+            pending.append((path, signature))
+    print(f"{len(pending)} chats to analyze ({len(paths) - len(pending)} already done).", file=sys.stderr)
+
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=limit_worker_processes,
+                             initargs=(args.workers,)) as executor, \
+            open(os.path.join(args.output, manifest_name), 'a', encoding='utf-8') as manifest:
+        futures = {
+            executor.submit(process_chat, path, args.output, users, section_names, args.format): (path, signature)
+            for path, signature in pending
+        }
+        for future in as_completed(futures):
+            path, signature = futures[future]
+            try:
+                output = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"FAILED {path}: {e}", file=sys.stderr)
+                continue
+            # Only the main process appends to the manifest, one flushed line per finished chat
+            manifest.write(json.dumps(dict(signature, output=output)) + '\n')
+            manifest.flush()
+            print(f"done {path} -> {output}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
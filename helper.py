@@ -1,15 +1,31 @@
 # --------------------- Helper Imports ---------------------
 from urlextract import URLExtract
-from wordcloud import WordCloud
+from wordcloud import WordCloud, STOPWORDS
 import pandas as pd
-from collections import Counter
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from functools import cached_property
+from itertools import chain
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+from urllib.parse import urlsplit
 import emoji
 from textblob import TextBlob
 import networkx as nx
-from gensim import corpora, models
+from gensim import corpora, matutils, models
 from nltk.corpus import stopwords
 import nltk
 import numpy as np
+from scipy import sparse
+import chat_cache
+import preprocessor
+import profiler
+import result_cache
 
 # Ensure NLTK stopwords are downloaded.
 try:
@@ -20,187 +36,718 @@ except LookupError:
 # Initialize URL extractor
 extract = URLExtract()
 
+# Most worker processes started by one analysis (sentiment scoring, topic training); None uses every CPU.
+# The batch CLI lowers it in its own workers, which already run one chat per CPU.
+max_workers = None
+
+# Whether topic training may use `LdaMulticore`, which forks a multiprocessing pool. Forking a process
+# that runs other threads (like the app server) can deadlock the children, so only single-threaded entry
+# points turn it on: the batch CLI's worker processes.
+fork_workers = False
+
+def cpu_workers():
+    """
+    Returns the number of worker processes an analysis may use: the CPU count, capped by `max_workers`.
+    """
+    return min(os.cpu_count() or 1, max_workers or float('inf'))
+
+# Stopwords are loaded once as frozensets, giving O(1) whole-word lookups:
+# the chat stopword list shipped with the app (Hinglish, English, Marathi) and NLTK's English list.
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stopwords.txt'), 'r', encoding='utf-8') as f:
+    chat_stop_words = frozenset(line.strip() for line in f if line.strip() and not line.startswith('//'))
+nltk_stop_words = frozenset(stopwords.words('english'))
+# Word clouds also drop WordCloud's built-in stopwords, as `WordCloud.generate` did
+wordcloud_stop_words = chat_stop_words | frozenset(STOPWORDS)
+
+# Lower-cased whitespace tokens of a chat, stored as one flat array for all messages:
+# 'vocab' holds every distinct token, 'codes' the vocab position of each token, 'rows' the message row
+# each token comes from and 'lengths' the number of tokens of every message.
+Tokens = namedtuple('Tokens', ['vocab', 'codes', 'rows', 'lengths'])
+
+# Message counts of a chat per (user, day, hour), stored as its non-empty cells: 'user' codes, 'day'
+# offsets into the calendar 'days' (every day from the first to the last message), 'hour' and 'count'.
+TimeCube = namedtuple('TimeCube', ['days', 'user', 'day', 'hour', 'count'])
+
+# A trained topic model with the vocab positions ('columns') of its dictionary words, in model id order
+TopicModel = namedtuple('TopicModel', ['lda', 'columns'])
+
+# Topic models are trained on conversation windows rather than single messages: a window ends after a
+# pause longer than `topic_window_gap` or once it holds `topic_window_size` messages.
+topic_window_gap = np.timedelta64(30, 'm')
+topic_window_size = 50
+# Bumped whenever windowing or training changes, so models persisted by older versions are not reused
+topic_model_version = '1'
+
+# --------------------- 0. Chat Index ---------------------
+class ChatIndex:
+    """
+    Row index of a processed chat, built once after `preprocessor.preprocess` and shared by all helpers.
+
+    Holds the row positions of every user's messages (in chat order) and precomputed masks for group
+    notifications and "<Media omitted>" messages, so a helper can slice one user's rows in O(rows for
+    that user) instead of comparing the whole 'user' column on every call.
+    Every helper accepts either a ChatIndex or a plain DataFrame (which is indexed on the fly).
+    """
+
+    def __init__(self, df, fingerprint=None):
+        self.df = df
+        if fingerprint is not None:
+            self.fingerprint = fingerprint
+        if isinstance(df['user'].dtype, pd.CategoricalDtype):
+            codes, users = df['user'].cat.codes.to_numpy(), df['user'].cat.categories
+        else:
+            codes, users = pd.factorize(df['user'])
+        self.users = list(users)
+        self.user_codes = codes
+        # A stable sort groups the rows by user while keeping each user's messages in chat order
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(users) + 1))
+        self.user_rows = {user: order[bounds[i]:bounds[i + 1]] for i, user in enumerate(users)}
+        self.is_notification = (df['user'] == 'group_notification').to_numpy()
+        self.is_media = (df['message'] == '<Media omitted>\n').to_numpy()
+        # Messages with actual text: neither group notifications nor omitted media
+        self.is_text = ~(self.is_notification | self.is_media)
+
+    @cached_property
+    def fingerprint(self):
+        """
+        Content hash of the chat, used by `result_cache` to key helper results. The app passes the hash of
+        the uploaded file instead, which saves hashing the parsed rows.
+        """
+        digest = hashlib.sha256()
+        for column in ['date', 'user', 'message']:
+            digest.update(pd.util.hash_pandas_object(self.df[column], index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def rows(self, selected_user):
+        """
+        Returns the row positions of the selected user's messages, or of all messages for "Overall".
+        """
+        if selected_user == 'Overall':
+            return np.arange(len(self.df))
+        return self.user_rows.get(selected_user, np.empty(0, dtype=np.intp))
+
+    def frame(self, selected_user):
+        """
+        Returns the messages of the selected user (the full DataFrame for "Overall").
+        """
+        if selected_user == 'Overall':
+            return self.df
+        return self.df.iloc[self.rows(selected_user)]
+
+    def text_rows(self, selected_user):
+        """
+        Returns the row positions of the selected user's messages without notifications and omitted media.
+        """
+        rows = self.rows(selected_user)
+        return rows[self.is_text[rows]]
+
+    @cached_property
+    @profiler.profiled()
+    def tokens(self):
+        """
+        Tokenizes every message once (lower-cased, split on whitespace) and caches the result as `Tokens`,
+        shared by word counts, word clouds and topic modeling. Repeated messages ("ok", "haha") are
+        split only once and their tokens are copied to every row with a vectorized gather.
+        """
+        message_codes, messages = pd.factorize(self.df['message'])
+        codes, vocab, lengths = expand_unique(message_codes, [message.lower().split() for message in messages])
+        rows = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)
+        return Tokens(vocab, codes.astype(np.int32), rows, lengths)
+
+    def stop_mask(self, stop_words):
+        """
+        Returns a boolean array marking which vocabulary entries are stop words (cached per stopword set).
+        """
+        masks = self.__dict__.setdefault('_stop_masks', {})
+        if stop_words not in masks:
+            masks[stop_words] = np.fromiter((word in stop_words for word in self.tokens.vocab),
+                                            dtype=bool, count=len(self.tokens.vocab))
+        return masks[stop_words]
+
+    def row_mask(self, rows):
+        """
+        Returns a boolean array over all messages that is True at the given row positions.
+        """
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def word_counts(self, rows, stop_words=frozenset()):
+        """
+        Returns a Series of token counts over the given rows, most frequent first, without stop words.
+        """
+        tokens = self.tokens
+        selected = self.row_mask(rows)
+        counts = np.bincount(tokens.codes[selected[tokens.rows]], minlength=len(tokens.vocab))
+        if stop_words:
+            counts[self.stop_mask(stop_words)] = 0
+        order = np.argsort(-counts, kind='stable')
+        order = order[counts[order] > 0]
+        return pd.Series(counts[order], index=tokens.vocab[order], name='count')
+
+    @cached_property
+    @profiler.profiled()
+    def time_cube(self):
+        """
+        Counts the messages of every (user, day, hour) in a single pass and caches them as a `TimeCube`.
+        All timelines and activity maps are reductions over this cube, never scans of the messages.
+        """
+        dates = self.df['date'].to_numpy().astype('datetime64[D]')
+        first = dates.min() if len(dates) else np.datetime64('1970-01-01', 'D')
+        day = (dates - first).astype(np.int64)
+        num_days = int(day.max()) + 1 if len(day) else 0
+        hour = self.df['hour'].to_numpy().astype(np.int64)
+        cells, counts = np.unique((self.user_codes.astype(np.int64) * num_days + day) * 24 + hour, return_counts=True)
+        return TimeCube(
+            days=pd.date_range(first, periods=num_days, freq='D'),
+            user=(cells // (num_days * 24)).astype(self.user_codes.dtype),
+            day=(cells // 24 % max(num_days, 1)).astype(np.int32),
+            hour=(cells % 24).astype(np.int8),
+            count=counts.astype(np.int32),
+        )
+
+    def activity(self, selected_user):
+        """
+        Returns the selected user's (or the whole chat's) message counts as a dense (days x 24 hours)
+        int32 array, reduced from the time cube.
+        """
+        cube = self.time_cube
+        cells = slice(None)
+        if selected_user != 'Overall':
+            code = self.users.index(selected_user) if selected_user in self.users else -1
+            # The cube's cells are sorted by user, so a user's cells are one contiguous run
+            cells = slice(*np.searchsorted(cube.user, [code, code + 1]))
+        counts = np.bincount(cube.day[cells].astype(np.int64) * 24 + cube.hour[cells],
+                             weights=cube.count[cells], minlength=len(cube.days) * 24)
+        return counts.astype(np.int32).reshape(len(cube.days), 24)
+
+    @cached_property
+    @profiler.profiled()
+    def conversation_windows(self):
+        """
+        Returns the conversation window number of every message (-1 for notifications and omitted media).
+        Windows are numbered over the whole chat, so a user's messages fall into the same windows as the
+        conversations they took part in.
+        """
+        rows = np.flatnonzero(self.is_text)
+        dates = self.df['date'].to_numpy()[rows]
+        new_session = np.ones(len(rows), dtype=bool)
+        new_session[1:] = np.diff(dates) > topic_window_gap
+        session = np.cumsum(new_session) - 1
+        position = np.arange(len(rows)) - np.flatnonzero(new_session)[session]
+        windows = np.full(len(self.df), -1, dtype=np.int64)
+        windows[rows] = np.cumsum(position % topic_window_size == 0) - 1
+        return windows
+
+    def window_matrix(self, rows, stop_words=frozenset()):
+        """
+        Returns the bag of words of the conversation windows covering the given rows as a sparse
+        (windows x vocab) count matrix, without stop words. Only tokens of the given rows are counted.
+        """
+        tokens = self.tokens
+        windows = self.conversation_windows
+        selected = self.row_mask(rows) & (windows >= 0)
+        keep = selected[tokens.rows] & ~self.stop_mask(stop_words)[tokens.codes]
+        window_ids, documents = np.unique(windows[tokens.rows[keep]], return_inverse=True)
+        # Duplicate (window, word) entries are summed into counts when the matrix is built
+        return sparse.csr_matrix((np.ones(len(documents), dtype=np.float32), (documents, tokens.codes[keep])),
+                                 shape=(len(window_ids), len(tokens.vocab)))
+
+    def topic_model(self, num_topics):
+        """
+        Returns the chat's `TopicModel` with `num_topics` topics (None if the chat has too few words),
+        trained once on the whole chat and cached per topic count.
+        """
+        topic_models = self.__dict__.setdefault('_topic_models', {})
+        if num_topics not in topic_models:
+            topic_models[num_topics] = load_topic_model(self, num_topics)
+        return topic_models[num_topics]
+
+    @cached_property
+    @profiler.profiled()
+    def replies(self):
+        """
+        Finds every reply of the chat once: a message whose sender differs from the sender of the previous
+        message (group notifications are skipped). Cached as a DataFrame with the reply's 'row', the user
+        codes of the 'responder' and of the user 'responded_to', and the reply latency in 'seconds'.
+        """
+        rows = np.flatnonzero(~self.is_notification)
+        dates = self.df['date'].to_numpy()[rows]
+        if len(dates) and (np.diff(dates) < np.timedelta64(0)).any():
+            order = np.argsort(dates, kind='stable')
+            rows, dates = rows[order], dates[order]
+        codes = self.user_codes[rows]
+        change = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        return pd.DataFrame({
+            'row': rows[change],
+            'responder': codes[change],
+            'responded_to': codes[change - 1],
+            'seconds': (dates[change] - dates[change - 1]) / np.timedelta64(1, 's'),
+        })
+
+    @cached_property
+    @profiler.profiled()
+    def links(self):
+        """
+        Extracts the links of every message once and caches them as a DataFrame with one row per link:
+        'row' (message position), 'url' and 'domain'.
+
+        A vectorized prefilter keeps only messages containing a dot followed by another character, "http"
+        or "www", and each distinct candidate message goes through URLExtract only once.
+        """
+        messages = self.df['message']
+        candidates = np.flatnonzero(messages.str.contains(r'\.[^\s.]|http|www', regex=True, na=False).to_numpy())
+        message_codes, uniques = pd.factorize(messages.iloc[candidates])
+        found = [extract.find_urls(message) for message in uniques]
+        counts = np.fromiter(map(len, found), dtype=np.int64, count=len(found))
+        urls = list(chain.from_iterable(found[code] for code in message_codes))
+        domains = {url: url_domain(url) for url in set(urls)}
+        return pd.DataFrame({
+            'row': np.repeat(candidates, counts[message_codes]) if len(candidates) else np.empty(0, dtype=np.intp),
+            'url': pd.Series(urls, dtype=object),
+            'domain': pd.Series([domains[url] for url in urls], dtype=object),
+        })
+
+    def user_links(self, selected_user):
+        """
+        Returns the cached links of the selected user's messages, joined with the message user and date.
+        """
+        links = self.links
+        links = links[self.row_mask(self.rows(selected_user))[links['row'].to_numpy()]]
+        rows = links['row'].to_numpy()
+        return links.assign(user=self.df['user'].to_numpy()[rows], only_date=self.df['only_date'].to_numpy()[rows])
+
+    @cached_property
+    @profiler.profiled()
+    def emoji_counts(self):
+        """
+        Counts the emojis of every user once and caches them as a sparse user x emoji count matrix,
+        returned as (matrix, emojis) with one matrix row per entry of `users`.
+
+        A vectorized prefilter keeps only messages where an emoji can start; each distinct one of them is
+        scanned once with the precompiled `emoji_regex`, so ZWJ sequences, skin tones and flags are
+        counted as single emojis.
+        """
+        messages = self.df['message']
+        candidates = np.flatnonzero(messages.str.contains(emoji_start, regex=True, na=False).to_numpy())
+        message_codes, uniques = pd.factorize(messages.iloc[candidates])
+        codes, emojis, lengths = expand_unique(message_codes, [emoji_regex.findall(message) for message in uniques])
+        users = np.repeat(self.user_codes[candidates], lengths)
+        matrix = sparse.coo_matrix(
+            (np.ones(len(codes), dtype=np.int64), (users, codes)), shape=(len(self.users), len(emojis))
+        ).tocsr()
+        return matrix, emojis
+
+    @cached_property
+    @profiler.profiled()
+    def sentiment(self):
+        """
+        Scores the sentiment of every text message once and caches it as a DataFrame aligned with the chat
+        rows, with 'polarity' and 'subjectivity' columns (NaN for notifications and omitted media).
+
+        Every distinct message is scored only once, so repeated messages like "ok" or "haha" cost a single
+        TextBlob call. Messages are compared exactly as written: TextBlob's scores depend on case
+        (e.g. ":D" is positive, ":d" is not), so any normalization would change them.
+        """
+        rows = np.flatnonzero(self.is_text)
+        message_codes, uniques = pd.factorize(self.df['message'].iloc[rows])
+        polarity, subjectivity = score_sentiment_batches(list(uniques))
+        scores = pd.DataFrame({
+            'polarity': np.full(len(self.df), np.nan, dtype=np.float32),
+            'subjectivity': np.full(len(self.df), np.nan, dtype=np.float32),
+        }, index=self.df.index)
+        scores.iloc[rows, 0] = polarity[message_codes]
+        scores.iloc[rows, 1] = subjectivity[message_codes]
+        return scores
+
+def expand_unique(message_codes, unique_items):
+    """
+    Expands the items (tokens, emojis) found in each distinct message to every row holding that message.
+
+    Parameters:
+        message_codes (ndarray): Position of every row's message in `unique_items` (from `pd.factorize`).
+        unique_items (list): One list of items per distinct message.
+
+    Returns:
+        tuple: (codes, vocab, lengths) - the vocab position of every item in row order, the distinct
+               items, and the number of items in every row.
+    """
+    unique_lengths = np.fromiter(map(len, unique_items), dtype=np.int64, count=len(unique_items))
+    flat = np.fromiter(chain.from_iterable(unique_items), dtype=object, count=int(unique_lengths.sum()))
+    unique_codes, vocab = pd.factorize(flat)
+
+    # Gather each row's slice of the flat unique items, keeping the rows in chat order
+    lengths = unique_lengths[message_codes]
+    unique_offsets = np.concatenate(([0], np.cumsum(unique_lengths)))
+    row_offsets = np.concatenate(([0], np.cumsum(lengths)))
+    gather = np.repeat(unique_offsets[message_codes] - row_offsets[:-1], lengths) + np.arange(row_offsets[-1])
+    return unique_codes[gather], np.asarray(vocab, dtype=object), lengths
+
+def url_domain(url):
+    """
+    Returns the lower-cased host name of a URL without a leading "www." (empty if it cannot be parsed).
+    """
+    try:
+        host = urlsplit(url if '://' in url else 'http://' + url).hostname or ''
+    except ValueError:
+        return ''
+    return host[4:] if host.startswith('www.') else host
+
+def chat_index(df):
+    """
+    Returns `df` itself if it already is a ChatIndex, otherwise builds one for the DataFrame.
+    """
+    return df if isinstance(df, ChatIndex) else ChatIndex(df)
+
 # --------------------- 1. Basic Statistics Functions ---------------------
+@result_cache.memoize
 def fetch_stats(selected_user, df):
     """
     Returns overall statistics for the chat:
-    - Number of messages, total words, media messages, and links shared.
+    - Number of messages, total words and media messages.
     
     If a specific user is selected (not "Overall"), the stats are computed only for that user.
+    The number of links is counted separately by `count_links`, as extracting them is slow.
     """
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
+    index = chat_index(df)
+    df = index.frame(selected_user)
     num_messages = df.shape[0]
     
-    # Count the number of words across all messages
-    words = []
-    for message in df['message']:
-        words.extend(message.split())
+    # Count the number of words across all messages from the chat's shared tokens
+    words = int(index.tokens.lengths[index.rows(selected_user)].sum())
     
     # Count media messages (assumes '<Media omitted>\n' indicates a media message)
-    num_media_messages = df[df['message'] == '<Media omitted>\n'].shape[0]
-    
-    # Count the number of links shared using URLExtract
-    num_links = []
-    for message in df['message']:
-        num_links.extend(extract.find_urls(message))
+    num_media_messages = int(index.is_media[index.rows(selected_user)].sum())
     
-    return num_messages, len(words), num_media_messages, len(num_links)
+    return num_messages, words, num_media_messages
+
+@result_cache.memoize
+def count_links(selected_user, df):
+    """
+    Returns the number of links shared, from the chat's cached link extraction.
+    """
+    return len(chat_index(df).user_links(selected_user))
 
+@result_cache.memoize
 def most_busy_users(df):
     """
     Returns two values:
     - A Series of the top users by message count.
     - A DataFrame with usernames and their percentage of total messages.
     """
+    df = chat_index(df).df
     x = df['user'].value_counts().head()
     df_perc = round((df['user'].value_counts() / df.shape[0]) * 100, 2).reset_index().rename(
         columns={'index': 'Username', 'user': 'Percentage'})
     return x, df_perc
 
 # --------------------- 2. WordCloud & Common Words ---------------------
-def create_wordcloud(selected_user, df):
+@result_cache.memoize
+def word_frequencies(selected_user, df):
+    """
+    Returns the word counts of the selected messages as a Series, built from the chat's shared token
+    counts: words are cut to their letters and digits the same way `WordCloud.generate` tokenizes text,
+    and stopwords (the chat list plus WordCloud's own) and pure numbers are dropped.
+    Excludes group notifications and media omitted messages.
+    """
+    index = chat_index(df)
+    counts = index.word_counts(index.text_rows(selected_user), chat_stop_words)
+    words = pd.Series(counts.index, dtype=object).str.findall(r"\w[\w']*")
+    frequencies = pd.Series(np.repeat(counts.to_numpy(), words.str.len().to_numpy()),
+                            index=pd.Index(list(chain.from_iterable(words)), dtype=object))
+    drop = frequencies.index.str.isdigit() | frequencies.index.isin(wordcloud_stop_words)
+    return frequencies[~drop].groupby(level=0).sum().sort_values(ascending=False, kind='stable')
+
+@result_cache.memoize
+def create_wordcloud(selected_user, df, width=500, height=500):
     """
     Generates and returns a WordCloud image based on chat messages,
     filtering out common stopwords (loaded from a file).
     
     This function excludes group notifications and media omitted messages.
+    The cloud is laid out from the precomputed `word_frequencies`, so the messages are never joined
+    into one string and tokenized a second time.
     """
-    # Read the stopwords from the file
-    with open('stopwords.txt', 'r') as f:
-        stop_words = f.read()
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    temp = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')]
-    
-    # Remove stopwords from each message
-    def remove_stop_words(message):
-        y = []
-        for word in message.lower().split():
-            if word not in stop_words:
-                y.append(word)
-        return " ".join(y)
-    
-    temp['message'] = temp['message'].apply(remove_stop_words)
-    
-    # Generate WordCloud
-    wc = WordCloud(width=500, height=500, min_font_size=10, background_color='white')
-    df_wc = wc.generate(temp['message'].str.cat(sep=" "))
+    frequencies = word_frequencies(selected_user, df)
+    wc = WordCloud(width=width, height=height, min_font_size=10, background_color='white')
+    df_wc = wc.generate_from_frequencies(frequencies.to_dict())
     return df_wc
 
+@result_cache.memoize
+def wordcloud_png(selected_user, df, size=500):
+    """
+    Renders the word cloud as a `size` x `size` PNG and returns its bytes (None if there are no words).
+    The rendered image is cached per chat, user and size, so the app can show a small preview while
+    reports use the full-size image.
+    """
+    if word_frequencies(selected_user, df).empty:
+        return None
+    buf = io.BytesIO()
+    create_wordcloud(selected_user, df, width=size, height=size).to_image().save(buf, format='PNG')
+    return buf.getvalue()
+
+@result_cache.memoize
 def most_common_words(selected_user, df):
     """
     Returns a DataFrame of the 20 most common words in the chat (excluding stopwords),
     along with their frequencies. Works for a specific user or overall.
     """
-    with open('stopwords.txt', 'r') as f:
-        stop_words = f.read()
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    temp = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')]
-    
-    words = []
-    for message in temp['message']:
-        for word in message.lower().split():
-            if word not in stop_words:
-                words.append(word)
-    most_common_df = pd.DataFrame(Counter(words).most_common(20))
+    index = chat_index(df)
+    counts = index.word_counts(index.text_rows(selected_user), chat_stop_words).head(20)
+    most_common_df = pd.DataFrame(list(zip(counts.index, counts.values)))
     return most_common_df
 
 # --------------------- 3. Emoji Analysis ---------------------
+def char_class(chars, gap=1):
+    """
+    Builds a regex character class covering `chars`, merging code points less than `gap` apart into one range.
+    """
+    codes = sorted(set(map(ord, chars)))
+    parts = []
+    start = prev = codes[0]
+    for code in codes[1:] + [None]:
+        if code is not None and code - prev <= gap:
+            prev = code
+            continue
+        parts.append(re.escape(chr(start)) + ('-' + re.escape(chr(prev)) if prev > start else ''))
+        if code is not None:
+            start = prev = code
+    return '[' + ''.join(parts) + ']'
+
+def compile_emoji_regex(emojis):
+    """
+    Compiles a longest-match regex for the given emoji sequences.
+
+    The emojis are stored in a trie, which is turned into nested alternations so every position is matched
+    character by character instead of trying thousands of alternatives; single-character leaves become
+    character classes. A cheap look-ahead (`emoji_start_pattern`) skips ordinary text, including digits.
+    """
+    trie = {}
+    for sequence in emojis:
+        node = trie
+        for ch in sequence:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def to_regex(node):
+        leaves = [ch for ch, child in node.items() if ch and list(child) == ['']]
+        branches = [re.escape(ch) + to_regex(child) for ch, child in sorted(node.items())
+                    if ch and list(child) != ['']]
+        if leaves:
+            branches.append(char_class(leaves))
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A shorter emoji ending here is optional, so longer sequences win and shorter ones still match
+        return f'(?:{body})?' if '' in node else body
+
+    return re.compile('(?=' + emoji_start_pattern(emojis) + ')' + to_regex(trie))
+
+def emoji_start_pattern(emojis):
+    """
+    Returns a cheap pattern matching where one of the given emojis can start: an ASCII keycap base
+    ("#", "*", digits) followed by its combining mark, or a character in the few code point ranges
+    emojis start with. Used as the regex look-ahead and as the vectorized message prefilter.
+    """
+    ascii_first = [s[0] for s in emojis if ord(s[0]) < 128]
+    ascii_second = [s[1] for s in emojis if ord(s[0]) < 128 and len(s) > 1]
+    other_first = [s[0] for s in emojis if ord(s[0]) >= 128]
+    return char_class(ascii_first) + char_class(ascii_second) + '|' + char_class(other_first, gap=64)
+
+# Emoji matcher built once from emoji.EMOJI_DATA (ZWJ sequences, skin tones, flags, keycaps)
+emoji_start = emoji_start_pattern(emoji.EMOJI_DATA)
+emoji_regex = compile_emoji_regex(emoji.EMOJI_DATA)
+
 def extract_emojis(s):
     """
-    Extracts all emojis present in the given string 's'.
+    Extracts all emojis present in the given string 's', keeping multi-codepoint emojis whole.
     """
-    return [c for c in s if c in emoji.EMOJI_DATA]
+    return emoji_regex.findall(s)
 
+@result_cache.memoize
 def emoji_helper(selected_user, df):
     """
     Analyzes emoji usage in chat messages.
     Returns a DataFrame with emojis and their counts, sorted by frequency.
+    Reads one row (or, for Overall, the column sums) of the chat's cached user x emoji count matrix.
     """
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    
-    emojis = []
-    for message in df['message'].dropna():
-        emojis.extend(extract_emojis(message))
-    emoji_df = pd.DataFrame(Counter(emojis).most_common(), columns=["emoji", "count"])
+    index = chat_index(df)
+    matrix, emojis = index.emoji_counts
+    if selected_user == 'Overall':
+        counts = np.asarray(matrix.sum(axis=0)).ravel()
+    elif selected_user in index.users:
+        counts = matrix[index.users.index(selected_user)].toarray().ravel()
+    else:
+        counts = np.zeros(len(emojis), dtype=np.int64)
+    order = np.argsort(-counts, kind='stable')
+    order = order[counts[order] > 0]
+    emoji_df = pd.DataFrame({"emoji": emojis[order], "count": counts[order]})
     return emoji_df
 
 # --------------------- 4. Timeline & Activity Analysis ---------------------
-def monthly_timeline(selected_user, df):
+def day_range(days, start=None, end=None):
+    """
+    Returns the slice of the calendar `days` between `start` and `end` (dates, both inclusive; None
+    leaves that side open).
+    """
+    first = days.searchsorted(pd.Timestamp(start)) if start is not None else 0
+    last = days.searchsorted(pd.Timestamp(end), side='right') if end is not None else len(days)
+    return slice(first, last)
+
+def lttb(x, y, max_points):
+    """
+    Downsamples a line to at most `max_points` points with Largest-Triangle-Three-Buckets: the first
+    and last points are kept, and from every bucket in between the point forming the largest triangle
+    with the previously kept point and the average of the next bucket. Peaks and dips survive, unlike
+    with plain averaging. The loop runs once per output point, so the cost does not depend on `len(x)`
+    beyond one pass over the data.
+
+    Returns:
+        ndarray: Positions of the kept points, in increasing order.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(area.argmax())
+        kept[i + 1] = previous
+    return kept
+
+@result_cache.memoize
+def monthly_timeline(selected_user, df, start=None, end=None):
     """
     Generates a timeline DataFrame grouped by month showing the count of messages.
     The timeline is formatted with month names and years.
+    `start` and `end` (dates, inclusive) restrict it to a date range.
     """
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    timeline = df.groupby(['year', 'month_num', 'month']).count()['message'].reset_index()
-    time = []
-    for i in range(timeline.shape[0]):
-        time.append(timeline['month'][i] + "-" + str(timeline['year'][i]))
-    timeline['time'] = time
+    index = chat_index(df)
+    days = index.time_cube.days
+    window = day_range(days, start, end)
+    days = days[window]
+    daily = index.activity(selected_user)[window].sum(axis=1)
+    first_year = days.year[0] if len(days) else 0
+    months = (days.year - first_year) * 12 + days.month - 1
+    counts = np.bincount(months, weights=daily, minlength=1).astype(np.int64)
+    used = np.flatnonzero(counts)
+    timeline = pd.DataFrame({
+        'year': (first_year + used // 12).astype('int16'),
+        'month_num': (used % 12 + 1).astype('int8'),
+        'month': pd.Categorical.from_codes(used % 12, categories=preprocessor.month_names, ordered=True),
+        'message': counts[used],
+    })
+    timeline['time'] = timeline['month'].astype(str) + "-" + timeline['year'].astype(str)
     return timeline
 
-def daily_timeline(selected_user, df):
+@result_cache.memoize
+def daily_timeline(selected_user, df, start=None, end=None, max_points=None):
     """
     Generates a daily timeline DataFrame that shows the number of messages per day.
+
+    Parameters:
+        start, end (date, optional): Only include days in this range (inclusive); it is re-aggregated
+            from the chat's time cube, not from the messages.
+        max_points (int, optional): Downsample to at most this many days with `lttb`, so plotting
+            costs the same however long the chat is.
     """
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    daily_timeline = df.groupby('only_date').count()['message'].reset_index()
-    return daily_timeline
+    index = chat_index(df)
+    window = day_range(index.time_cube.days, start, end)
+    daily = index.activity(selected_user)[window].sum(axis=1, dtype=np.int64)
+    used = np.flatnonzero(daily)
+    if max_points:
+        used = used[lttb(used, daily[used], max_points)]
+    return pd.DataFrame({'only_date': index.time_cube.days[window][used], 'message': daily[used]})
+
+@result_cache.memoize
+def hourly_activity(selected_user, df):
+    """
+    Returns a Series with the message counts per hour of the day (0-23).
+    """
+    return pd.Series(chat_index(df).activity(selected_user).sum(axis=0, dtype=np.int64),
+                     index=pd.RangeIndex(24, name='hour'), name='count')
+
+def activity_counts(counts, categories, name):
+    """
+    Turns per-category message counts into a Series like `value_counts` of the categorical column `name`:
+    most active first, without empty categories.
+    """
+    order = np.argsort(-counts, kind='stable')
+    order = order[counts[order] > 0]
+    index = pd.CategoricalIndex(pd.Categorical.from_codes(order, categories=categories, ordered=True), name=name)
+    return pd.Series(counts[order], index=index, name='count')
 
+@result_cache.memoize
 def week_activity_map(selected_user, df):
     """
     Returns a Series with the message counts per day of the week.
     """
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    return df['day_name'].value_counts()
+    index = chat_index(df)
+    daily = index.activity(selected_user).sum(axis=1)
+    counts = np.bincount(index.time_cube.days.dayofweek, weights=daily, minlength=7).astype(np.int64)
+    return activity_counts(counts, preprocessor.day_names, 'day_name')
 
+@result_cache.memoize
 def month_activity_map(selected_user, df):
     """
     Returns a Series with the message counts per month.
     """
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    return df['month'].value_counts()
+    index = chat_index(df)
+    daily = index.activity(selected_user).sum(axis=1)
+    counts = np.bincount(index.time_cube.days.month - 1, weights=daily, minlength=12).astype(np.int64)
+    return activity_counts(counts, preprocessor.month_names, 'month')
 
+@result_cache.memoize
 def activity_heatmap(selected_user, df):
     """
     Creates and returns a pivot table (DataFrame) for the activity heatmap,
     where rows represent days of the week and columns represent time periods.
     """
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    user_heatmap = df.pivot_table(index='day_name', columns='period', values='message', aggfunc='count').fillna(0)
-    return user_heatmap
+    index = chat_index(df)
+    activity = index.activity(selected_user)
+    weekdays = index.time_cube.days.dayofweek
+    heatmap = np.zeros((7, 24))
+    np.add.at(heatmap, weekdays, activity)
+    # Like a pivot table, only days and periods with messages get a row or column
+    rows = np.flatnonzero(heatmap.sum(axis=1))
+    columns = np.flatnonzero(heatmap.sum(axis=0))
+    return pd.DataFrame(
+        heatmap[np.ix_(rows, columns)],
+        index=pd.CategoricalIndex(pd.Categorical.from_codes(rows, categories=preprocessor.day_names, ordered=True),
+                                  name='day_name'),
+        columns=pd.CategoricalIndex(pd.Categorical.from_codes(columns, categories=preprocessor.period_labels,
+                                                              ordered=True), name='period'),
+    )
 
 # --------------------- 5. Sentiment Analysis ---------------------
+@result_cache.memoize
 def sentiment_analysis(selected_user, df):
     """
     Performs sentiment analysis on the chat messages using TextBlob.
     Returns a DataFrame with sentiment counts and their percentages.
     Excludes group notifications and media omitted messages.
     """
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    df = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')]
-    if df.empty:
+    index = chat_index(df)
+    rows = index.text_rows(selected_user)
+    if not len(rows):
         return pd.DataFrame({
             'Sentiment': ['Positive', 'Negative', 'Neutral'],
             'Count': [0, 0, 0],
             'Percentage': [0.0, 0.0, 0.0]
         })
-    polarity_scores = []
-    for message in df['message']:
-        analysis = TextBlob(message)
-        polarity_scores.append(analysis.sentiment.polarity)
-    positive_count = sum(score > 0 for score in polarity_scores)
-    negative_count = sum(score < 0 for score in polarity_scores)
-    neutral_count = sum(score == 0 for score in polarity_scores)
+    # Reuse the chat's cached per-message scores instead of running TextBlob again
+    polarity_scores = index.sentiment['polarity'].to_numpy()[rows]
+    positive_count = int((polarity_scores > 0).sum())
+    negative_count = int((polarity_scores < 0).sum())
+    neutral_count = int((polarity_scores == 0).sum())
     total = positive_count + negative_count + neutral_count
     if total == 0:
         return pd.DataFrame({
@@ -218,92 +765,421 @@ def sentiment_analysis(selected_user, df):
     })
     return sentiment_df
 
+def score_sentiment(messages):
+    """
+    Scores a batch of messages with TextBlob and returns (polarity, subjectivity) arrays.
+    """
+    sentiments = [TextBlob(message).sentiment for message in messages]
+    polarity = np.fromiter((s.polarity for s in sentiments), dtype=np.float32, count=len(sentiments))
+    subjectivity = np.fromiter((s.subjectivity for s in sentiments), dtype=np.float32, count=len(sentiments))
+    return polarity, subjectivity
+
+def score_sentiment_batches(messages, workers=None, batch_size=2000, min_parallel=20000):
+    """
+    Scores messages in batches, spread over a process pool when there are at least `min_parallel`
+    messages and more than one CPU; smaller inputs are scored in this process. Workers are spawned
+    rather than forked, since the app server runs many threads.
+    Returns (polarity, subjectivity) arrays in the order of `messages`.
+    """
+    workers = workers or cpu_workers()
+    if len(messages) < min_parallel or workers <= 1:
+        return score_sentiment(messages)
+    batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        results = list(executor.map(score_sentiment, batches))
+    return (np.concatenate([polarity for polarity, _ in results]),
+            np.concatenate([subjectivity for _, subjectivity in results]))
+
+@result_cache.memoize
+def user_sentiment(df):
+    """
+    Returns a per-user sentiment summary (mean polarity and subjectivity, share of positive and negative
+    messages), built from the chat's cached per-message scores at no extra scoring cost.
+    """
+    index = chat_index(df)
+    rows = index.text_rows('Overall')
+    scores = index.sentiment.iloc[rows].assign(user=index.df['user'].to_numpy()[rows])
+    scores['positive'] = scores['polarity'] > 0
+    scores['negative'] = scores['polarity'] < 0
+    summary = scores.groupby('user', observed=True).agg(
+        messages=('polarity', 'size'), polarity=('polarity', 'mean'), subjectivity=('subjectivity', 'mean'),
+        positive=('positive', 'mean'), negative=('negative', 'mean'))
+    summary[['positive', 'negative']] *= 100
+    return summary.round(3).reset_index()
+
+@result_cache.memoize
+def sentiment_timeline(selected_user, df):
+    """
+    Returns a monthly sentiment timeline: mean polarity and the number of positive, negative and neutral
+    messages per month, built from the chat's cached per-message scores.
+    """
+    index = chat_index(df)
+    rows = index.text_rows(selected_user)
+    frame = index.df.iloc[rows]
+    polarity = index.sentiment['polarity'].to_numpy()[rows]
+    scores = pd.DataFrame({
+        'year': frame['year'].to_numpy(), 'month_num': frame['month_num'].to_numpy(), 'polarity': polarity,
+        'positive': polarity > 0, 'negative': polarity < 0, 'neutral': polarity == 0,
+    })
+    timeline = scores.groupby(['year', 'month_num']).agg(
+        polarity=('polarity', 'mean'), positive=('positive', 'sum'),
+        negative=('negative', 'sum'), neutral=('neutral', 'sum')).reset_index()
+    timeline['time'] = pd.to_datetime(dict(year=timeline['year'], month=timeline['month_num'], day=1))
+    return timeline
+
 # --------------------- 6. Conversation Network Graph ---------------------
-def conversation_network_graph(selected_user, df):
+def reply_matrix(index, rows, window_minutes=None):
+    """
+    Counts replies between users as a sparse (users x users) matrix over the given rows in chat order:
+    entry [a, b] is the number of times user code a wrote right after user code b. With `window_minutes`,
+    only messages written within that many minutes of the previous one count as replies.
+    """
+    codes = index.user_codes[rows]
+    replies = codes[1:] != codes[:-1]
+    if window_minutes:
+        dates = index.df['date'].to_numpy()[rows]
+        replies &= np.diff(dates) <= np.timedelta64(int(window_minutes * 60), 's')
+    size = len(index.users)
+    return sparse.csr_matrix((np.ones(int(replies.sum()), dtype=np.int64),
+                              (codes[1:][replies], codes[:-1][replies])), shape=(size, size))
+
+@result_cache.memoize
+def conversation_network_graph(selected_user, df, window_minutes=None, top_n=10):
     """
-    Builds a conversation network graph using NetworkX.
-    For Overall analysis, it filters to the top 10 active users to reduce clutter.
-    Connects consecutive messages between different users.
+    Builds a directed conversation network graph using NetworkX, where an edge A -> B weighted w means
+    A replied to B w times (A's message directly followed B's).
+    For Overall analysis, it filters to the top `top_n` active users to reduce clutter; for a single user
+    it shows that user's replies to and from everyone else.
+
+    Parameters:
+        window_minutes (float, optional): Only count a reply if it came within this many minutes.
     """
-    # For Overall analysis: consider only top 10 active users
+    index = chat_index(df)
+    rows = np.flatnonzero(~index.is_notification)
+    counts = pd.Series({user: len(index.user_rows[user]) for user in index.users if user != 'group_notification'},
+                       dtype=int)
+    # For Overall analysis: consider only the most active users
     if selected_user == 'Overall':
-        msg_counts = df[df['user'] != 'group_notification']['user'].value_counts().nlargest(10).index.tolist()
-        df = df[df['user'].isin(msg_counts)]
-    else:
-        df = df[df['user'] == selected_user]
-    graph = nx.Graph()
-    users = df['user'].tolist()
-    for i in range(1, len(users)):
-        if users[i] != users[i-1]:
-            if graph.has_edge(users[i-1], users[i]):
-                graph[users[i-1]][users[i]]['weight'] += 1
-            else:
-                graph.add_edge(users[i-1], users[i], weight=1)
+        top_users = counts[counts > 0].nlargest(top_n).index
+        top_codes = np.array([index.users.index(user) for user in top_users], dtype=index.user_codes.dtype)
+        rows = rows[np.isin(index.user_codes[rows], top_codes)]
+    matrix = reply_matrix(index, rows, window_minutes).tocoo()
+    if selected_user != 'Overall':
+        code = index.users.index(selected_user) if selected_user in index.users else -1
+        keep = (matrix.row == code) | (matrix.col == code)
+        matrix = sparse.coo_matrix((matrix.data[keep], (matrix.row[keep], matrix.col[keep])), shape=matrix.shape)
+
+    graph = nx.DiGraph()
+    users = index.users
+    graph.add_weighted_edges_from(
+        (users[source], users[target], int(weight)) for source, target, weight in zip(matrix.row, matrix.col, matrix.data))
     return graph
 
+@result_cache.memoize
+def conversation_graph_layout(selected_user, df, window_minutes=None, top_n=10):
+    """
+    Returns node positions for `conversation_network_graph`, computed once per graph and then served from
+    the result cache, so redrawing the graph does not rerun the spring layout.
+    """
+    graph = conversation_network_graph(selected_user, df, window_minutes=window_minutes, top_n=top_n)
+    return nx.spring_layout(graph, k=0.5, seed=42)
+
 # --------------------- 7. Topic Modeling & Keyword Extraction ---------------------
+@profiler.profiled()
+def train_topic_model(index, num_topics, passes=10, max_document_passes=200000):
+    """
+    Trains an LDA model on the conversation windows of the whole chat.
+
+    The dictionary is filled from the vectorized window counts and pruned with `filter_extremes`
+    (words in fewer than 2 windows or in more than half of them), so rare typos and ever-present chat
+    filler do not end up as topics. `LdaMulticore` forks its worker pool, which is unsafe in a process
+    running other threads (the app trains from a background thread of the Streamlit server), so it is only
+    used where `fork_workers` allows it and more than one CPU is available (see `max_workers`); otherwise
+    the model is trained with `LdaModel` in the calling thread. Online LDA converges in fewer passes on
+    large corpora, so the number of passes is reduced to keep the total number of window visits below
+    `max_document_passes`.
+
+    Returns:
+        TopicModel or None: None if no words are left to train on.
+    """
+    matrix = index.window_matrix(index.text_rows('Overall'), nltk_stop_words)
+    doc_freq = np.diff(matrix.tocsc().indptr)
+    used = np.flatnonzero(doc_freq)
+    if not len(used):
+        return None
+    vocab = index.tokens.vocab
+    dictionary = corpora.Dictionary()
+    dictionary.token2id = dict(zip(vocab[used].tolist(), range(len(used))))
+    dictionary.dfs = dict(enumerate(doc_freq[used].tolist()))
+    dictionary.num_docs = matrix.shape[0]
+    # Pruning needs enough windows to tell rare and ubiquitous words apart
+    if dictionary.num_docs >= 10:
+        dictionary.filter_extremes(no_below=2, no_above=0.5, keep_n=20000)
+    if not len(dictionary):
+        return None
+    columns = topic_model_columns(dictionary, vocab)
+    corpus = matutils.Sparse2Corpus(matrix[:, columns], documents_columns=False)
+
+    passes = max(1, min(passes, max_document_passes // matrix.shape[0]))
+    workers = cpu_workers() - 1 if fork_workers else 0
+    # Perplexity logging (eval_every) would cost a full extra pass over the corpus each time
+    if workers > 0:
+        lda = models.LdaMulticore(corpus, num_topics=num_topics, id2word=dictionary, passes=passes,
+                                  workers=workers, chunksize=2000, eval_every=None, random_state=0)
+    else:
+        lda = models.LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=passes,
+                              chunksize=2000, eval_every=None, random_state=0)
+    return TopicModel(lda, columns)
+
+def topic_model_columns(dictionary, vocab):
+    """
+    Maps the words of a gensim dictionary (in id order) to their positions in the chat's vocab.
+    """
+    words = [dictionary[i] for i in range(len(dictionary))]
+    return pd.Index(vocab).get_indexer(words)
+
+def load_topic_model(index, num_topics):
+    """
+    Returns the chat's topic model from the model cache, training and saving it on a miss.
+
+    Models are persisted per chat fingerprint under `<CHAT_CACHE_DIR>/topics` when the parsed-chat cache
+    is enabled (see `chat_cache`); otherwise they only live as long as the ChatIndex.
+    """
+    if not chat_cache.cache_dir:
+        return train_topic_model(index, num_topics)
+    directory = os.path.join(chat_cache.cache_dir, 'topics',
+                             f"{index.fingerprint}-{num_topics}-v{topic_model_version}")
+    path = os.path.join(directory, 'model.lda')
+    if os.path.exists(path):
+        try:
+            lda = models.LdaModel.load(path)
+            return TopicModel(lda, topic_model_columns(lda.id2word, index.tokens.vocab))
+        except (OSError, ValueError, EOFError):
+            pass
+
+    model = train_topic_model(index, num_topics)
+    if model is not None:
+        # gensim writes several files, so save into a temporary directory and move it into place at once
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        tmp_directory = tempfile.mkdtemp(dir=os.path.dirname(directory))
+        try:
+            model.lda.save(os.path.join(tmp_directory, 'model.lda'))
+            os.replace(tmp_directory, directory)
+        except OSError:
+            pass
+        finally:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+    return model
+
+def topic_shares(index, model, rows):
+    """
+    Infers the topic mix of the conversation windows covering the given rows with a trained model.
+    Returns each topic's share of those windows' words, or None if none of their words are in the model.
+    """
+    matrix = index.window_matrix(rows, nltk_stop_words)[:, model.columns]
+    matrix = matrix[matrix.getnnz(axis=1) > 0]
+    if not matrix.shape[0]:
+        return None
+    gamma, _ = model.lda.inference(list(matutils.Sparse2Corpus(matrix, documents_columns=False)))
+    theta = gamma / gamma.sum(axis=1, keepdims=True)
+    weights = np.asarray(matrix.sum(axis=1)).ravel()
+    return weights @ theta / weights.sum()
+
+@result_cache.memoize
 def topic_modeling(selected_user, df, num_topics=3, num_words=5):
     """
     Performs topic modeling using LDA (Latent Dirichlet Allocation) from gensim.
     Filters out group notifications and media omitted messages.
-    Returns topics as a list of formatted strings showing the top words and their weights.
+
+    One model is trained per chat on conversation windows (see `train_topic_model`); the view of a
+    user is inferred from that model on the user's own messages, so switching users never retrains.
+    Returns topics as a list of formatted strings showing each topic's share of the selected messages
+    and its top words with their weights, most prominent topic first.
     """
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    temp = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')]
-    documents = temp['message'].tolist()
-    if not documents:
+    index = chat_index(df)
+    rows = index.text_rows(selected_user)
+    if not len(rows):
         return "Not enough data for topic modeling."
-    
-    # Basic tokenization and stopword removal using NLTK stopwords
-    stops = set(stopwords.words('english'))
-    texts = []
-    for doc in documents:
-        tokens = doc.lower().split()
-        filtered_tokens = [token for token in tokens if token not in stops]
-        texts.append(filtered_tokens)
-    
-    # Create dictionary and corpus for LDA
-    dictionary = corpora.Dictionary(texts)
-    corpus = [dictionary.doc2bow(text) for text in texts]
-    if not corpus:
+    model = index.topic_model(num_topics)
+    shares = topic_shares(index, model, rows) if model is not None else None
+    if shares is None:
         return "Not enough data for topic modeling."
     
-    lda_model = models.LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=10)
-    topics = lda_model.show_topics(num_topics=num_topics, num_words=num_words, formatted=False)
-    
     # Format topics in a user-friendly way
     formatted_topics = []
-    for topic_no, word_probs in topics:
-        topic_words = [f"{word} ({weight:.3f})" for word, weight in word_probs]
-        topic_str = f"Topic {topic_no + 1}: " + ", ".join(topic_words)
+    for topic_no in np.argsort(-shares, kind='stable'):
+        topic_words = [f"{word} ({weight:.3f})" for word, weight in model.lda.show_topic(topic_no, topn=num_words)]
+        topic_str = f"Topic {topic_no + 1} ({shares[topic_no]:.0%}): " + ", ".join(topic_words)
         formatted_topics.append(topic_str)
     
     return formatted_topics
 
 # --------------------- 8. Engagement & Response Time Analysis ---------------------
-def response_time_analysis(selected_user, df):
+def group_percentiles(keys, values, percentiles=(50, 90, 99), small_group=64):
+    """
+    Computes count, mean and percentiles of `values` for every group of equal `keys`, in O(n).
+
+    The keys are combined into one code per value and mapped to dense group ids with a bincount over the
+    code space (products of small user-code ranges here). Counts and means are bincounts. The values are
+    then put in group order with a counting sort (stable 16-bit argsorts, which NumPy runs as radix sorts),
+    without sorting the values themselves. Percentiles use NumPy's default linear interpolation and only
+    need the order statistics at their positions:
+    - Groups of up to `small_group` values are padded to the next power of two and sorted row-wise in one
+      2-D sort per size, a constant cost per value.
+    - Larger groups are selected with one `np.partition` each, which is linear in the group size.
+
+    Parameters:
+        keys (list): Integer arrays of group codes, e.g. [responder codes, responded-to codes].
+        values (ndarray): The values to summarize.
+        percentiles (tuple): Percentiles to compute (0-100).
+        small_group (int): Largest group size handled by the padded row-wise sorts.
+
+    Returns:
+        tuple: (list of key arrays per group, counts, means, percentile matrix with one column per percentile)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    fractions = np.asarray(percentiles, dtype=np.float64) / 100
+    if not len(values):
+        return [np.zeros(0, dtype=np.int64) for _ in keys], np.zeros(0, dtype=np.int64), np.zeros(0), \
+            np.zeros((0, len(fractions)))
+
+    # One code per value, then dense group ids in key order
+    sizes = [int(key.max()) + 1 for key in keys]
+    code = np.zeros(len(values), dtype=np.int64)
+    for key, size in zip(keys, sizes):
+        code = code * size + key
+    space = np.bincount(code)
+    present = np.flatnonzero(space)
+    group = (np.cumsum(space > 0) - 1)[code]
+    counts = space[present]
+    means = np.bincount(group, weights=values, minlength=len(present)) / counts
+
+    # Counting sort of the values by group: LSD radix passes over 16-bit digits of the group id
+    order = np.argsort((group & 0xFFFF).astype(np.uint16), kind='stable')
+    if len(present) > 1 << 16:
+        order = order[np.argsort((group[order] >> 16).astype(np.uint16), kind='stable')]
+    grouped = values[order]
+    starts = np.cumsum(counts) - counts
+
+    # Positions of every percentile inside its group, interpolated between the lower and upper statistic
+    position = (counts[:, None] - 1) * fractions
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    low_values = np.empty(position.shape)
+    high_values = np.empty(position.shape)
+
+    width = 1
+    while width <= small_group:
+        rows = np.flatnonzero((counts <= width) & (counts > width // 2))
+        if len(rows):
+            cells = np.arange(width)
+            padded = np.where(cells < counts[rows, None],
+                              grouped[np.minimum(starts[rows, None] + cells, len(grouped) - 1)], np.inf)
+            padded.sort(axis=1)
+            low_values[rows] = np.take_along_axis(padded, lower[rows], axis=1)
+            high_values[rows] = np.take_along_axis(padded, upper[rows], axis=1)
+        width *= 2
+    for row in np.flatnonzero(counts > small_group):
+        kth = np.union1d(lower[row], upper[row])
+        selected = np.partition(grouped[starts[row]:starts[row] + counts[row]], kth)
+        low_values[row] = selected[lower[row]]
+        high_values[row] = selected[upper[row]]
+
+    table = low_values + (high_values - low_values) * (position - lower)
+    return list(np.unravel_index(present, sizes)), counts, means, table
+
+def user_replies(index, selected_user, cap_hours=None):
     """
-    Computes the average response time (in hours) for each user based on the 
-    time difference between consecutive messages. Group notifications are excluded.
+    Returns the replies written by the selected user (all replies for 'Overall'), without replies that
+    came more than `cap_hours` after the message they answer (e.g. the first message of the next morning).
     """
+    replies = index.replies
     if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    df = df.sort_values('date')
-    df = df[df['user'] != 'group_notification']
-    # Calculate time difference in hours between consecutive messages
-    df['response_time'] = df['date'].diff().dt.total_seconds() / 3600
-    response_df = df.groupby('user')['response_time'].mean().reset_index()
-    response_df['response_time'] = response_df['response_time'].fillna(0).round(2)
-    return response_df
+        code = index.users.index(selected_user) if selected_user in index.users else -1
+        replies = replies[replies['responder'].to_numpy() == code]
+    if cap_hours:
+        replies = replies[replies['seconds'].to_numpy() <= cap_hours * 3600]
+    return replies
+
+@result_cache.memoize
+def response_time_analysis(selected_user, df, cap_hours=None):
+    """
+    Computes how quickly each user responds, in hours. A response is a message that follows a message
+    from somebody else; its latency is the time since that message. Group notifications are excluded.
+    Returns a DataFrame with each user's mean ('response_time'), median (p50), p90 and p99 latency and
+    number of replies.
+
+    Parameters:
+        cap_hours (float, optional): Ignore replies that came more than this many hours later.
+    """
+    index = chat_index(df)
+    replies = user_replies(index, selected_user, cap_hours)
+    (responders,), counts, means, table = group_percentiles(
+        [replies['responder'].to_numpy()], replies['seconds'].to_numpy() / 3600)
+    response_df = pd.DataFrame({
+        'user': [index.users[code] for code in responders],
+        'response_time': means,
+        'p50': table[:, 0], 'p90': table[:, 1], 'p99': table[:, 2],
+        'replies': counts,
+    })
+    return response_df.round(2)
+
+@result_cache.memoize
+def response_pairs(selected_user, df, cap_hours=None):
+    """
+    Computes response latencies (in hours) per pair of users: how quickly 'responder' replies to
+    'responded_to', with the mean ('response_time'), p50, p90, p99 and number of replies.
+    For a single user, only the replies written by that user are included.
+    """
+    index = chat_index(df)
+    replies = user_replies(index, selected_user, cap_hours)
+    (responders, responded_to), counts, means, table = group_percentiles(
+        [replies['responder'].to_numpy(), replies['responded_to'].to_numpy()], replies['seconds'].to_numpy() / 3600)
+    pairs_df = pd.DataFrame({
+        'responder': [index.users[code] for code in responders],
+        'responded_to': [index.users[code] for code in responded_to],
+        'response_time': means,
+        'p50': table[:, 0], 'p90': table[:, 1], 'p99': table[:, 2],
+        'replies': counts,
+    })
+    return pairs_df.round(2)
 
 # --------------------- 9. Silent Observers List ---------------------
+@result_cache.memoize
 def silent_observers(df):
     """
     Identifies the 3 users with the lowest message counts (excluding group notifications),
     which can be seen as "silent observers".
     """
-    temp = df[df['user'] != 'group_notification']
-    msg_counts = temp['user'].value_counts().reset_index().rename(columns={'index': 'User', 'user': 'Message Count'})
+    index = chat_index(df)
+    temp = index.df[~index.is_notification]
+    msg_counts = temp['user'].value_counts()
+    msg_counts = msg_counts[msg_counts > 0].rename_axis('User').reset_index(name='Message Count')
     silent_list = msg_counts.sort_values('Message Count').head(3)
     return silent_list
+
+# --------------------- 10. Link Analysis ---------------------
+@result_cache.memoize
+def links_per_user(df):
+    """
+    Returns a DataFrame with the number of links shared by each user, most links first.
+    """
+    links = chat_index(df).user_links('Overall')
+    counts = links.groupby('user', observed=True).size().sort_values(ascending=False)
+    return counts.rename_axis('user').reset_index(name='links')
+
+@result_cache.memoize
+def links_per_domain(selected_user, df):
+    """
+    Returns a DataFrame with the number of links shared per domain (e.g. "youtube.com"), most links first.
+    """
+    links = chat_index(df).user_links(selected_user)
+    return links['domain'].value_counts().rename_axis('domain').reset_index(name='links')
+
+@result_cache.memoize
+def link_timeline(selected_user, df):
+    """
+    Returns a daily timeline DataFrame with the number of links shared per day.
+    """
+    links = chat_index(df).user_links(selected_user)
+    return links.groupby('only_date').size().reset_index(name='links')
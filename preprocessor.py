@@ -1,91 +1,434 @@
+import mmap
+import os
 import re
+import zipfile
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain
 import pandas as pd
+from pandas.api.types import union_categoricals
+import profiler
 
-def preprocess(data):
+# Version of the parsed DataFrame layout; bump it whenever `preprocess` output changes so cached chats are re-parsed
+parser_version = '3'
+
+# Number of characters at the start of an export that are inspected to detect its dialect
+sniff_size = 8192
+
+# Describes one export dialect: the regex matching the date-time stamp that starts every message and the
+# exact strptime format of that stamp. 'alt_date_format' swaps day and month when the sniffed sample could
+# not tell them apart (every day and month was <= 12); it is only tried if 'date_format' fails.
+# 'dotted_meridiem' marks Spanish-style "a. m."/"p. m." stamps, which are rewritten to AM/PM before parsing.
+Dialect = namedtuple('Dialect', ['name', 'pattern', 'date_format', 'alt_date_format', 'dotted_meridiem'],
+                     defaults=[False])
+
+# Default dialect: US 12-hour Android exports (e.g., "12/31/20, 9:35 PM - ")
+pattern = r'\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s[APap][Mm]\s-\s'
+default_dialect = Dialect('android-12h', pattern, '%m/%d/%y, %I:%M %p - ', None)
+
+# Loose pattern used only on the sniffed sample, matching the date-time stamp of Android exports
+# ("31/12/2020, 21:35 - ", "12/31/20, 9:35 PM - ", "31.12.20 21:35 - ", "31/12/20, 9:35 p. m. - ",
+# "2020-12-31, 21:35 - ") and iOS exports ("[31/12/20, 21:35:12] ")
+sniff_regex = re.compile(
+    r'^\u200e?(?P<open>\[)?(?P<lead_year>\d{4}(?P<lead_sep>[/.\-]))?'
+    r'(?P<first>\d{1,2})(?P<sep>[/.\-])(?P<second>\d{1,2})(?(lead_year)|(?P=sep)(?P<year>\d{4}|\d{2}))'
+    r'(?P<comma>,?)\s\d{1,2}:\d{2}(?P<seconds>:\d{2})?'
+    r'(?P<ampm>(?P<ampm_space>\s?)(?:[APap][Mm]|(?P<dotted>[APap]\.\s?[Mm]\.)))?'
+    r'(?(open)\]\s|\s-\s)',
+    re.MULTILINE
+)
+
+# Spanish-style meridiems ("a. m.", "p. m."), which strptime's %p does not read
+dotted_am = re.compile(r'[Aa]\.\s?[Mm]\.')
+dotted_pm = re.compile(r'[Pp]\.\s?[Mm]\.')
+
+def sniff_dialect(sample):
+    """
+    Detects the export dialect from the first few KB of a chat export.
+
+    The date-time stamps found at the start of the sample's lines decide the bracket style (iOS or Android),
+    date separator, day/month order, year length and position, presence of seconds, 12/24-hour clock and
+    meridiem style (AM/PM or "a. m."/"p. m."). From these an
+    exact header regex and strptime format are built, so the rest of the export is parsed with a fixed
+    format and never with per-row format inference.
+
+    Parameters:
+        sample (str): The beginning of the raw chat data.
+
+    Returns:
+        Dialect: The detected dialect, or `default_dialect` if no date-time stamp is found.
+    """
+    matches = [m for m in sniff_regex.finditer(sample) if m['lead_sep'] in (None, m['sep'])]
+    if not matches:
+        return default_dialect
+
+    # Use the most common stamp shape in the sample, ignoring the odd line that merely looks like a stamp
+    def stamp_shape(m):
+        return (bool(m['open']), m['sep'], bool(m['lead_year']), len(m['year'] or m['lead_year'][:-1]), m['comma'],
+                bool(m['seconds']), bool(m['ampm']), m['ampm_space'], bool(m['dotted']))
+
+    shape = Counter(stamp_shape(m) for m in matches).most_common(1)[0][0]
+    is_ios, sep, year_first, year_len, comma, has_seconds, is_12h, ampm_space, dotted = shape
+    matches = [m for m in matches if stamp_shape(m) == shape]
+
+    # Day/month order: a value above 12 settles it, otherwise fall back to the usual order for the clock
+    # (day first for Spanish-style meridiems, month first after a leading year, as in ISO dates)
+    ambiguous = False
+    if any(int(m['first']) > 12 for m in matches):
+        day_first = True
+    elif any(int(m['second']) > 12 for m in matches):
+        day_first = False
+    else:
+        day_first = (not is_12h or dotted) and not year_first
+        ambiguous = True
+
+    # Build the exact header regex and matching strptime format for this shape
+    sep_regex = re.escape(sep)
+    year_regex = r'\d{4}' if year_len == 4 else r'\d{2}'
+    meridiem_regex = r'\s?[APap]\.\s?[Mm]\.' if dotted else r'\s?[APap][Mm]'
+    time_regex = r'\d{1,2}:\d{2}' + (r':\d{2}' if has_seconds else '') + (meridiem_regex if is_12h else '')
+    if year_first:
+        header = rf'{year_regex}{sep_regex}\d{{1,2}}{sep_regex}\d{{1,2}}{comma}\s{time_regex}'
+    else:
+        header = rf'\d{{1,2}}{sep_regex}\d{{1,2}}{sep_regex}{year_regex}{comma}\s{time_regex}'
+    header = rf'\[{header}\]\s' if is_ios else rf'{header}\s-\s'
+
+    def date_format(day_first):
+        year = '%Y' if year_len == 4 else '%y'
+        day_month = sep.join(['%d', '%m'] if day_first else ['%m', '%d'])
+        date = f'{year}{sep}{day_month}' if year_first else f'{day_month}{sep}{year}'
+        time = ('%I' if is_12h else '%H') + ':%M' + (':%S' if has_seconds else '') + \
+            (ampm_space + '%p' if is_12h else '')
+        return f'[{date}{comma} {time}] ' if is_ios else f'{date}{comma} {time} - '
+
+    name = ('ios' if is_ios else 'android') + ('-12h' if is_12h else '-24h')
+    return Dialect(name, header, date_format(day_first), date_format(not day_first) if ambiguous else None,
+                   dotted)
+
+def parse_stamps(stamps, dialect, date_format):
+    """
+    Converts date-time stamp strings to datetimes with one of the dialect's exact formats, rewriting
+    "a. m."/"p. m." meridiems to AM/PM first. Raises ValueError if a stamp does not match the format.
+    """
+    if dialect.dotted_meridiem:
+        stamps = stamps.str.replace(dotted_am, 'AM', regex=True).str.replace(dotted_pm, 'PM', regex=True)
+    return pd.to_datetime(stamps, format=date_format)
+
+@lru_cache(maxsize=None)
+def message_regex(header):
+    """
+    Compiles the single-pass message pattern for a dialect's date-time stamp regex: the stamp, an optional
+    "sender: " prefix on the first line and the message body, which runs (across lines) up to the next
+    date-time stamp or the end of the data.
+    """
+    return re.compile(
+        r'(?P<date>' + header + r')(?:(?P<user>[^\n]+?):\s)?(?P<message>.*?)(?=' + header + r'|\Z)',
+        re.DOTALL
+    )
+
+# Month and weekday names, used as the categories of the "month" and "day_name" columns
+month_names = ['January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December']
+day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Time period labels for every hour of the day (e.g., "1 PM - 2 PM"), indexed by hour
+period_labels = []
+for hour in range(24):
+    if hour == 23:
+        period_labels.append("11 PM - 12 AM")
+    elif hour == 0:
+        period_labels.append("12 AM - 1 AM")
+    elif hour < 12:
+        period_labels.append(f"{hour} AM - {hour+1} AM")
+    elif hour == 12:
+        period_labels.append("12 PM - 1 PM")
+    else:
+        period_labels.append(f"{hour-12} PM - {hour-11} PM")
+
+# 12-hour "HH:MM AM/PM" labels for every minute of the day, indexed by hour * 60 + minute
+time_labels = [f"{(hour % 12) or 12:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+               for hour in range(24) for minute in range(60)]
+
+@profiler.profiled()
+def preprocess(data, dialect=None):
     """
     Preprocesses raw WhatsApp chat data and returns a formatted DataFrame.
 
     This function performs the following tasks:
-      1. Splits the raw chat data using a regular expression pattern that matches the 12-hour date-time format.
-      2. Extracts messages and their corresponding timestamps.
-      3. Converts timestamps to datetime objects.
-      4. Separates the sender (user) from the message content.
-      5. Creates additional time-related columns (date, month, day, hour, etc.) for further analysis.
+      1. Detects the export dialect (date order, 12/24-hour clock, Android or iOS) from the first few KB.
+      2. Scans the raw chat data once with a compiled regular expression that captures the
+         date-time stamp, the sender (user) and the message content of every message.
+      3. Converts timestamps to datetime objects with the dialect's fixed format.
+      4. Creates additional time-related columns (date, month, day, hour, etc.) for further analysis.
 
     Parameters:
         data (str): The raw chat data as a single string.
+        dialect (Dialect, optional): The export dialect; detected with `sniff_dialect` when omitted.
 
     Returns:
         DataFrame: A pandas DataFrame containing the processed chat data with columns:
                    - date: Message timestamp as a datetime object.
-                   - user: Username or "group_notification" for system messages.
+                   - user: Username or "group_notification" for system messages (categorical).
                    - message: The actual text content of the message.
-                   - only_date: Date part of the timestamp (without time).
-                   - year, month_num, month, day, day_name, hour, minute: Time-related fields.
-                   - period: A string representing the time period (e.g., "2 PM - 3 PM").
-                   - time: Formatted time in 12-hour format with AM/PM.
+                   - only_date: Date part of the timestamp (midnight of the message day).
+                   - year, month_num, day, hour, minute: Time-related fields as small integers.
+                   - month, day_name: Month and weekday names (ordered categoricals).
+                   - period: The time period of the message (e.g., "2 PM - 3 PM"), categorical.
+                   - time: Formatted time in 12-hour format with AM/PM, categorical.
     """
-    # Define a regex pattern to match the date and time stamp (e.g., "12/31/20, 9:35 PM - ")
-    pattern = r'\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s[APap][Mm]\s-\s'
-    
-    # Split the raw data into messages using the pattern and extract the matching date-time stamps
-    messages = re.split(pattern, data)[1:]
-    dates = re.findall(pattern, data)
-    
-    # Create a DataFrame with the extracted messages and their corresponding date-time stamps
-    df = pd.DataFrame({'user_message': messages, 'message_date': dates})
-    
-    # Convert the date-time strings into pandas datetime objects using the provided format
-    df['message_date'] = pd.to_datetime(df['message_date'], format='%m/%d/%y, %I:%M %p - ')
+    if dialect is None:
+        dialect = sniff_dialect(data[:sniff_size])
+
+    # Scan the raw data once, capturing the date-time stamp, sender and message body of every message
+    df = pd.DataFrame(message_regex(dialect.pattern).findall(data), columns=['date', 'user', 'message'])
     
-    # Rename the column for clarity
-    df.rename(columns={'message_date': 'date'}, inplace=True)
+    # Convert the date-time strings into pandas datetime objects using the dialect's exact format
+    try:
+        df['date'] = parse_stamps(df['date'], dialect, dialect.date_format)
+    except ValueError:
+        if dialect.alt_date_format is None:
+            raise
+        df['date'] = parse_stamps(df['date'], dialect, dialect.alt_date_format)
     
-    # Extract the user and message text from the 'user_message' column
-    users = []
-    messages_list = []
-    for message in df['user_message']:
-        # Split the message using a pattern that captures the sender's name before ": "
-        entry = re.split('([\w\W]+?):\s', message)
-        if entry[1:]:
-            users.append(entry[1])
-            messages_list.append(" ".join(entry[2:]))
-        else:
-            # If no sender is found, mark as 'group_notification'
-            users.append('group_notification')
-            messages_list.append(entry[0])
+    # Messages without a "sender: " prefix are system messages, mark them as 'group_notification'
+    df['user'] = df['user'].mask(df['user'] == '', 'group_notification')
     
-    # Create separate 'user' and 'message' columns and drop the temporary 'user_message' column
-    df['user'] = users
-    df['message'] = messages_list
-    df.drop(columns=['user_message'], inplace=True)
+    # Store the sender as a categorical: every user name is kept once instead of once per message
+    df['user'] = df['user'].astype('category')
     
-    # Create additional columns for easier time-based analysis
-    df['only_date'] = df['date'].dt.date
-    df['year'] = df['date'].dt.year
-    df['month_num'] = df['date'].dt.month
-    df['month'] = df['date'].dt.month_name()
-    df['day'] = df['date'].dt.day
-    df['day_name'] = df['date'].dt.day_name()
-    df['hour'] = df['date'].dt.hour
-    df['minute'] = df['date'].dt.minute
-
-    # Create a "period" column that groups time into intervals (e.g., "1 PM - 2 PM")
-    period = []
-    for hour in df['hour']:
-        if hour == 23:
-            period.append("11 PM - 12 AM")
-        elif hour == 0:
-            period.append("12 AM - 1 AM")
-        elif hour < 12:
-            period.append(f"{hour} AM - {hour+1} AM")
-        elif hour == 12:
-            period.append("12 PM - 1 PM")
-        else:
-            period.append(f"{hour-12} PM - {hour-11} PM")
-    df['period'] = period
-
-    # Format the 'time' column in a 12-hour format with AM/PM
-    df['time'] = df['date'].dt.strftime('%I:%M %p')
+    # Create additional compact columns for easier time-based analysis
+    dt = df['date'].dt
+    df['only_date'] = dt.normalize()
+    df['year'] = dt.year.astype('int16')
+    df['month_num'] = dt.month.astype('int8')
+    df['month'] = pd.Categorical.from_codes(df['month_num'] - 1, categories=month_names, ordered=True)
+    df['day'] = dt.day.astype('int8')
+    df['day_name'] = pd.Categorical.from_codes(dt.dayofweek, categories=day_names, ordered=True)
+    df['hour'] = dt.hour.astype('int8')
+    df['minute'] = dt.minute.astype('int8')
+
+    # Look up the "period" (e.g., "1 PM - 2 PM") and 12-hour 'time' labels by hour and minute of the day
+    df['period'] = pd.Categorical.from_codes(df['hour'], categories=period_labels, ordered=True)
+    df['time'] = pd.Categorical.from_codes(
+        df['hour'].astype('int16') * 60 + df['minute'], categories=time_labels, ordered=True
+    )
     
     return df
+
+
+def preprocess_stream(file, chunk_size=100000, encoding='utf-8'):
+    """
+    Streams a WhatsApp chat export from a file object and yields it as DataFrame chunks.
+
+    The file is read line by line, so memory stays bounded by the chunk size instead of
+    the export size. A chunk is only cut right before a line that starts a new message,
+    which keeps multi-line messages intact. The dialect is sniffed once from the first few KB
+    and reused for every chunk; when its day/month order is ambiguous, chunks are held back until
+    a later stamp settles it, so every chunk uses the same date format. Each chunk is parsed by `preprocess`, so the
+    yielded DataFrames have exactly the same columns, and their index continues from the
+    previous chunk so that `concat_chunks` of all chunks equals `preprocess` on the whole text.
+
+    Parameters:
+        file: A file object opened in text or binary mode (binary lines are decoded with `encoding`).
+        chunk_size (int): Maximum number of messages per yielded DataFrame.
+        encoding (str): Encoding used to decode binary input.
+
+    Yields:
+        DataFrame: Consecutive chunks of the processed chat data.
+    """
+    lines = (line.decode(encoding) if isinstance(line, bytes) else line for line in file)
+
+    # Detect the dialect from the first few KB, then parse every chunk with it
+    head = []
+    head_size = 0
+    for line in lines:
+        head.append(line)
+        head_size += len(line)
+        if head_size >= sniff_size:
+            break
+    dialect = sniff_dialect("".join(head))
+    header = re.compile(r'\u200e?(' + dialect.pattern + ')')
+    stamps = re.compile(r'^\u200e?(' + dialect.pattern + ')', re.MULTILINE)
+
+    # An ambiguous day/month order has to be decided for the whole export, as `preprocess` does. Until a
+    # chunk settles it (a stamp that only parses one way), the raw chunks are held back, then all of
+    # them are parsed with the same format; an export that never settles it keeps the primary format.
+    date_format = dialect.date_format if dialect.alt_date_format is None else None
+    pending = []
+    offset = 0
+
+    def settle(text):
+        nonlocal date_format
+        found = stamps.findall(text)
+        for tried, other in [(dialect.date_format, dialect.alt_date_format),
+                             (dialect.alt_date_format, dialect.date_format)]:
+            try:
+                parse_stamps(pd.Series(found, dtype=object), dialect, tried)
+            except ValueError:
+                date_format = other
+                return
+
+    def flush(text):
+        nonlocal offset
+        texts = [text]
+        if date_format is None:
+            pending.append(text)
+            settle(text)
+            if date_format is None:
+                return
+            texts = pending[:]
+            pending.clear()
+        for chunk_text in texts:
+            df = preprocess(chunk_text, dialect._replace(date_format=date_format, alt_date_format=None))
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            yield df
+
+    buffer = []
+    num_messages = 0
+    for line in chain(head, lines):
+        match = header.match(line)
+        if match:
+            # A full chunk is flushed only when the next message begins, never mid-message.
+            # A left-to-right mark before the stamp still belongs to the previous message.
+            if num_messages >= chunk_size:
+                buffer.append(line[:match.start(1)])
+                line = line[match.start(1):]
+                yield from flush("".join(buffer))
+                buffer = []
+                num_messages = 0
+            num_messages += 1
+        buffer.append(line)
+
+    if num_messages:
+        yield from flush("".join(buffer))
+    if pending:
+        # Nothing settled the order, so keep the primary format like `preprocess` does
+        date_format = dialect.date_format
+        texts = pending[:]
+        pending.clear()
+        for chunk_text in texts:
+            yield from flush(chunk_text)
+
+
+def concat_chunks(chunks):
+    """
+    Concatenates DataFrame chunks produced by `preprocess_stream` into a single DataFrame.
+
+    Each chunk has its own set of user categories, so a plain `pd.concat` would fall back to
+    object strings for the "user" column. The user categories are merged here instead, giving
+    the same result as calling `preprocess` on the whole chat.
+    """
+    chunks = list(chunks)
+    if not chunks:
+        return preprocess("")
+    df = pd.concat(chunks)
+    df['user'] = union_categoricals([chunk['user'] for chunk in chunks], sort_categories=True)
+    return df
+
+
+def preprocess_parallel(data, workers=None, min_chunk_size=1000000):
+    """
+    Preprocesses raw WhatsApp chat data on several CPU cores.
+
+    The data is split into `workers` ranges of roughly equal size. Each cut is moved forward to the
+    next line that starts with a date-time stamp, so no message is split between two ranges. The ranges
+    are parsed by `preprocess` in a `ProcessPoolExecutor` with the dialect sniffed from the start of
+    the export, and the partial DataFrames are concatenated in order. The result is identical to
+    `preprocess(data)`.
+
+    Parameters:
+        data (str): The raw chat data as a single string.
+        workers (int, optional): Number of worker processes (defaults to the number of CPUs).
+        min_chunk_size (int): Minimum number of characters per range; small exports are parsed serially.
+
+    Returns:
+        DataFrame: The processed chat data, with the same columns as `preprocess`.
+    """
+    dialect = sniff_dialect(data[:sniff_size])
+    workers = min(workers or os.cpu_count() or 1, max(1, len(data) // min_chunk_size))
+    if workers <= 1:
+        return preprocess(data, dialect)
+
+    # Move every cut forward to the start of the next message header
+    line_header = re.compile(r'^\u200e?(' + dialect.pattern + ')', re.MULTILINE)
+    cuts = [0]
+    for i in range(1, workers):
+        match = line_header.search(data, max(cuts[-1], len(data) * i // workers))
+        if match is None:
+            break
+        if match.start(1) > cuts[-1]:
+            cuts.append(match.start(1))
+    cuts.append(len(data))
+    ranges = [data[start:end] for start, end in zip(cuts, cuts[1:])]
+
+    # An ambiguous day/month order has to be decided for the whole export, as `preprocess` does:
+    # parse with the primary format everywhere and only switch to the swapped one if any range fails
+    formats = [dialect.date_format] + ([dialect.alt_date_format] if dialect.alt_date_format else [])
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        for i, date_format in enumerate(formats):
+            range_dialect = dialect._replace(date_format=date_format, alt_date_format=None)
+            try:
+                chunks = list(executor.map(preprocess, ranges, [range_dialect] * len(ranges)))
+                break
+            except ValueError:
+                if i == len(formats) - 1:
+                    raise
+
+    offset = 0
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+    return concat_chunks(chunks)
+
+
+@profiler.profiled()
+def read_export(source, chunk_size=100000):
+    """
+    Reads a WhatsApp chat export and returns the processed DataFrame without holding the whole text in memory.
+
+    Accepts the `.zip` produced by WhatsApp's "Export chat" as well as a plain `.txt` export, either as a
+    local file path or as a binary file object (such as a Streamlit upload). The chat member of a zip
+    archive is decompressed as a stream, and a local text file is memory-mapped; in both cases the lines
+    are fed straight into `preprocess_stream`, so no decoded copy of the full export is ever built.
+
+    Parameters:
+        source: Path to the export, or a binary file object positioned anywhere (it is rewound).
+        chunk_size (int): Number of messages parsed per chunk.
+
+    Returns:
+        DataFrame: The processed chat data, with the same columns as `preprocess`.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            if zipfile.is_zipfile(file):
+                return read_export(file, chunk_size)
+            if os.fstat(file.fileno()).st_size == 0:
+                return preprocess("")
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return concat_chunks(preprocess_stream(iter(mapped.readline, b''), chunk_size))
+
+    source.seek(0)
+    if not zipfile.is_zipfile(source):
+        source.seek(0)
+        return concat_chunks(preprocess_stream(source, chunk_size))
+
+    source.seek(0)
+    with zipfile.ZipFile(source) as archive:
+        with archive.open(chat_member(archive)) as member:
+            return concat_chunks(preprocess_stream(member, chunk_size))
+
+
+def chat_member(archive):
+    """
+    Returns the name of the chat text file inside an exported WhatsApp zip archive: "_chat.txt" for
+    iOS exports, otherwise the first ".txt" file (e.g. "WhatsApp Chat with ....txt" on Android).
+    """
+    names = [name for name in archive.namelist() if name.lower().endswith('.txt')]
+    for name in names:
+        if os.path.basename(name) == '_chat.txt':
+            return name
+    if not names:
+        raise ValueError("No chat .txt file found in the zip archive.")
+    return names[0]
@@ -0,0 +1,219 @@
+"""
+Lightweight stage profiler: wall time, CPU time, peak traced memory and row counts of the expensive
+stages (parsing, each analysis, link extraction, sentiment scoring, topic training, chart rendering).
+
+Profiling is off unless `CHAT_PROFILE=1` is set or `enable()` is called; the app only offers its
+performance panel when profiling is on. While it is off, a profiled call costs one extra function call and a flag check. Records are kept
+in memory for every session of the server, can be exported as JSON or JSON lines, and are also written
+to the 'profiler' logger as structured log lines when `CHAT_PROFILE_LOG=1` is set.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+import pandas as pd
+
+enabled = False
+log_records = os.environ.get('CHAT_PROFILE_LOG', '') not in ('', '0')
+# Only the most recent records are kept, so a long-running server does not grow without bound
+max_records = int(os.environ.get('CHAT_PROFILE_MAX_RECORDS', 2000))
+
+records = deque(maxlen=max_records)
+lock = threading.Lock()
+logger = logging.getLogger('profiler')
+if log_records and not logger.handlers:
+    # One JSON object per line on stderr, ready for log collectors
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+# Stages running in each thread, innermost last, so a stage's peak memory also covers its nested stages
+local = threading.local()
+# Whether tracemalloc was started by `enable`, and is therefore stopped again by `disable`
+started_tracing = False
+
+
+def enable(trace_memory=True):
+    """
+    Turns profiling on. With `trace_memory`, tracemalloc is started to record peak memory; it slows
+    Python code down noticeably while it runs.
+    """
+    global enabled, started_tracing
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+    enabled = True
+
+def disable():
+    """
+    Turns profiling off, stopping tracemalloc if `enable` started it. Records are kept.
+    """
+    global enabled, started_tracing
+    enabled = False
+    if started_tracing:
+        tracemalloc.stop()
+        started_tracing = False
+
+def clear():
+    with lock:
+        records.clear()
+
+if os.environ.get('CHAT_PROFILE', '') not in ('', '0'):
+    enable()
+
+
+# --------------------- 1. Stages ---------------------
+def row_count(result):
+    """
+    Returns the number of rows of a pandas result (or items of a sequence), or None for other results.
+    """
+    if isinstance(result, (pd.DataFrame, pd.Series, list, dict)):
+        return len(result)
+    if isinstance(result, tuple) and result:
+        return row_count(result[0])
+    return None
+
+def chat_rows(args):
+    """
+    Returns the number of messages of the first chat (ChatIndex or DataFrame) among a call's arguments.
+    """
+    for arg in args:
+        df = getattr(arg, 'df', arg)
+        if isinstance(df, pd.DataFrame):
+            return len(df)
+    return None
+
+class stage:
+    """
+    Context manager recording one run of a stage. Set `rows` on it to record the number of result rows.
+
+    CPU time is that of the running thread. tracemalloc has a single peak for the whole process, so the
+    peak memory of stages running at the same time in other threads (e.g. background analyses) is only
+    approximate.
+
+    Example:
+        with profiler.stage('render monthly_timeline') as s:
+            ...
+            s.rows = len(timeline)
+    """
+    __slots__ = ('name', 'chat_rows', 'rows', 'active', 'wall', 'cpu', 'memory', 'peak')
+
+    def __init__(self, name, chat_rows=None):
+        self.name = name
+        self.chat_rows = chat_rows
+        self.rows = None
+        self.active = enabled
+
+    def __enter__(self):
+        if self.active:
+            stack = getattr(local, 'stack', None)
+            if stack is None:
+                stack = local.stack = []
+            self.memory, self.peak = None, 0
+            if tracemalloc.is_tracing():
+                # Resetting the peak would lose the enclosing stage's peak so far, so hand it up first
+                self.memory, peak = tracemalloc.get_traced_memory()
+                if stack:
+                    stack[-1].peak = max(stack[-1].peak, peak)
+                tracemalloc.reset_peak()
+            stack.append(self)
+            self.wall, self.cpu = time.perf_counter(), time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if not self.active:
+            return False
+        wall, cpu = time.perf_counter() - self.wall, time.thread_time() - self.cpu
+        local.stack.pop()
+        peak_bytes = None
+        if self.memory is not None and tracemalloc.is_tracing():
+            # A nested stage resets tracemalloc's peak, so it hands its own peak up to this stage
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            peak_bytes = max(self.peak - self.memory, 0)
+            if local.stack:
+                local.stack[-1].peak = max(local.stack[-1].peak, self.peak)
+        add_record({
+            'stage': self.name, 'started': round(time.time() - wall, 3),
+            'wall_seconds': round(wall, 6), 'cpu_seconds': round(cpu, 6), 'peak_bytes': peak_bytes,
+            'chat_rows': self.chat_rows, 'rows': self.rows,
+            'thread': threading.current_thread().name, 'error': exc_type.__name__ if exc_type else None,
+        })
+        return False
+
+def profiled(name=None):
+    """
+    Decorator recording every call of a function as a stage named `name` (the function's qualified
+    name by default), with the size of its chat argument and the rows of its result.
+    """
+    def decorator(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with stage(stage_name, chat_rows(args)) as s:
+                result = func(*args, **kwargs)
+                s.rows = row_count(result)
+            return result
+        return wrapper
+    return decorator
+
+def add_record(record):
+    with lock:
+        records.append(record)
+    if log_records:
+        logger.info(json.dumps(record))
+
+
+# --------------------- 2. Reports ---------------------
+def table():
+    """
+    Returns the recorded stages as a DataFrame, most recent first.
+    """
+    with lock:
+        rows = list(records)
+    stages = pd.DataFrame(rows[::-1], columns=['stage', 'wall_seconds', 'cpu_seconds', 'peak_bytes', 'chat_rows',
+                                               'rows', 'thread', 'error', 'started'])
+    stages = stages.astype({'peak_bytes': 'Int64', 'chat_rows': 'Int64', 'rows': 'Int64'})
+    stages['started'] = pd.to_datetime(stages['started'], unit='s')
+    return stages
+
+def summary():
+    """
+    Returns one row per stage with its number of calls, total and maximum wall time, total CPU time and
+    largest peak memory, slowest stages first.
+    """
+    stages = table()
+    if stages.empty:
+        return pd.DataFrame(columns=['stage', 'calls', 'wall_seconds', 'max_wall_seconds', 'cpu_seconds',
+                                     'peak_mb'])
+    grouped = stages.groupby('stage').agg(
+        calls=('wall_seconds', 'size'),
+        wall_seconds=('wall_seconds', 'sum'),
+        max_wall_seconds=('wall_seconds', 'max'),
+        cpu_seconds=('cpu_seconds', 'sum'),
+        peak_mb=('peak_bytes', 'max'),
+    )
+    grouped['peak_mb'] = (grouped['peak_mb'] / 2**20).round(1)
+    return grouped.sort_values('wall_seconds', ascending=False).round(3).reset_index()
+
+def export_json():
+    """
+    Returns the records as a JSON document, in recording order.
+    """
+    with lock:
+        rows = list(records)
+    return json.dumps({'records': rows}, indent=2)
+
+def export_json_lines():
+    """
+    Returns the records as JSON lines, one structured log line per stage run.
+    """
+    with lock:
+        rows = list(records)
+    return ''.join(json.dumps(row) + '\n' for row in rows)
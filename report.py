@@ -0,0 +1,316 @@
+"""
+PDF report of the analysis: the charts on a 2x3 grid per page, plus an optional appendix of data tables.
+
+The report is only built when it is downloaded. Its charts are rasterized in a process pool at a
+resolution matching their size on the page, and both the charts and the finished PDF are kept in the
+result cache per chat, user and parameters, so adding the appendix does not redraw any chart.
+"""
+import io
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import emoji
+import helper, charts, profiler, result_cache
+
+# ReportLab Imports for PDF report generation
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+
+# Resolution of the charts shown in the analysis tabs
+screen_dpi = 150
+# A default 6.4 inch wide figure fills a 3.75 inch grid cell at about 135 dpi of the page
+pdf_dpi = 80
+
+# Worker processes drawing the report charts, started on first use and shared by every session
+render_pool = None
+render_pool_lock = threading.Lock()
+
+
+# --------------------- 1. Chart Data ---------------------
+def chart_data(chart, selected_user, chat, start=None, end=None, max_points=None, window_minutes=None):
+    """
+    Collects the helper results a chart is drawn from, as the arguments of its function in `charts`.
+
+    Parameters:
+        chart (str): Name of the chart in `charts.drawings`.
+        start, end (date, optional): Date range of the timelines.
+        max_points (int, optional): Number of points the daily timeline is downsampled to.
+        window_minutes (float, optional): Reply window of the conversation network graph.
+    """
+    if chart == 'monthly_timeline':
+        return (helper.monthly_timeline(selected_user, chat, start=start, end=end),)
+    if chart == 'daily_timeline':
+        return (helper.daily_timeline(selected_user, chat, start=start, end=end, max_points=max_points),)
+    if chart == 'busy_day':
+        return (helper.week_activity_map(selected_user, chat),)
+    if chart == 'busy_month':
+        return (helper.month_activity_map(selected_user, chat),)
+    if chart == 'heatmap':
+        return (helper.activity_heatmap(selected_user, chat),)
+    if chart == 'most_busy_users':
+        return (helper.most_busy_users(chat)[0],)
+    if chart == 'common_words':
+        return (helper.most_common_words(selected_user, chat),)
+    if chart == 'emoji':
+        return (helper.emoji_helper(selected_user, chat),)
+    if chart == 'network':
+        # The layout is cached with the graph, so redrawing does not rerun the spring layout
+        return (helper.conversation_network_graph(selected_user, chat, window_minutes=window_minutes),
+                helper.conversation_graph_layout(selected_user, chat, window_minutes=window_minutes))
+    if chart == 'sentiment':
+        return (helper.sentiment_analysis(selected_user, chat),)
+    if chart == 'sentiment_trend':
+        return (helper.sentiment_timeline(selected_user, chat),)
+    raise ValueError(f"Unknown chart: {chart}")
+
+@result_cache.memoize
+def chart_png(chart, selected_user, chat, dpi=screen_dpi, **params):
+    """
+    Returns a chart as PNG bytes (None if it has nothing to plot), drawn once per chat, user and
+    parameters. `params` are passed on to `chart_data`.
+    """
+    return charts.render_png(chart, chart_data(chart, selected_user, chat, **params), dpi)
+
+
+# --------------------- 2. Parallel Chart Rendering ---------------------
+def get_render_pool():
+    """
+    Returns the process pool rendering report charts, or None on a single CPU, where charts are drawn
+    in this process. Workers are spawned rather than forked, since the app server runs many threads.
+    """
+    global render_pool
+    workers = min(os.cpu_count() or 1, 4)
+    if workers <= 1:
+        return None
+    with render_pool_lock:
+        if render_pool is None:
+            render_pool = ProcessPoolExecutor(max_workers=workers,
+                                              mp_context=multiprocessing.get_context('spawn'))
+        return render_pool
+
+def render_all(jobs, dpi):
+    """
+    Renders (chart, data) pairs to PNG bytes, in parallel when a process pool is available.
+    """
+    pool = get_render_pool()
+    if pool is None:
+        return [charts.render_png(chart, data, dpi) for chart, data in jobs]
+    futures = [pool.submit(charts.render_png, chart, data, dpi) for chart, data in jobs]
+    return [future.result() for future in futures]
+
+@result_cache.memoize
+def report_charts(selected_user, chat, start=None, end=None, max_points=None, window_minutes=None):
+    """
+    Returns the (title, PNG bytes) pairs of the report's charts, in page order, rendered at `pdf_dpi`.
+    Charts with nothing to plot are left out.
+    """
+    titles = [
+        ('monthly_timeline', "Monthly Timeline (Monthly Moments)"),
+        ('daily_timeline', "Daily Timeline (Daily Dialogues)"),
+        ('busy_day', "Most Busy Day (Peak Activity Zones)"),
+        ('busy_month', "Most Busy Month (Peak Activity Zones)"),
+        ('heatmap', "Weekly Activity Heatmap (Weekly Heatmap)"),
+        ('wordcloud', "Word Cloud (Word Wonderland)"),
+        ('common_words', "Most Common Words (Key Conversations)"),
+        ('emoji', "Emoji Analysis (Emoji Insights)"),
+    ]
+    if selected_user == 'Overall':
+        titles.append(('network', "Conversation Network Graph (Chat Connections)"))
+    titles.append(('sentiment', "Sentiment Analysis (Mood Overview)"))
+
+    # The helper results are gathered here, from the result cache; only the drawing is sent to workers
+    params = dict(start=start, end=end, max_points=max_points, window_minutes=window_minutes)
+    jobs = [(chart, chart_data(chart, selected_user, chat, **params))
+            for chart, _ in titles if chart != 'wordcloud']
+    pngs = dict(zip([chart for chart, _ in jobs], render_all(jobs, pdf_dpi)))
+    # The word cloud is already a cached image
+    pngs['wordcloud'] = helper.wordcloud_png(selected_user, chat)
+    return [(title, pngs[chart]) for chart, title in titles if pngs[chart] is not None]
+
+
+# --------------------- 3. PDF Generation ---------------------
+def wrap_text(text, max_chars=30):
+    words = text.split()
+    lines = []
+    current_line = ""
+    for word in words:
+        if len(current_line + word) <= max_chars:
+            current_line += word + " "
+        else:
+            lines.append(current_line.strip())
+            current_line = word + " "
+    if current_line:
+        lines.append(current_line.strip())
+    return lines
+
+@profiler.profiled()
+def generate_pdf_charts_report(charts, summary_text="", tables=()):
+    """
+    Draws the report: a cover page with `summary_text`, the (title, image) `charts` six to a page, and
+    an appendix with the (title, header, rows) `tables` if any are given. Returns the PDF as a BytesIO.
+    """
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    page_width, page_height = letter
+    margin = 0.5 * inch
+
+    # --- COVER PAGE ---
+    c.setFillColorRGB(0.95, 0.95, 0.95)
+    c.rect(0, 0, page_width, page_height, fill=1)
+    c.setLineWidth(2)
+    c.setStrokeColorRGB(0, 0, 0)
+    c.rect(margin, margin, page_width - 2*margin, page_height - 2*margin)
+
+    # Title and other details for Cover Page
+    title_y = page_height * 0.65
+    tagline_y = page_height * 0.55
+    summary_y = page_height * 0.45
+    date_y = page_height * 0.35
+
+    c.setFillColorRGB(0, 0, 0)
+    c.setFont("Helvetica-Bold", 20)
+    c.drawCentredString(page_width / 2, title_y, "WhatsApp Chat Analyzer Report")
+
+    c.setFont("Helvetica", 14)
+    c.drawCentredString(page_width / 2, tagline_y, "Unlocking your chat insights")
+
+    c.setFont("Helvetica", 12)
+    c.drawCentredString(page_width / 2, summary_y, summary_text)
+
+    current_date = datetime.now().strftime("%B %d, %Y")
+    c.setFont("Helvetica-Oblique", 10)
+    c.drawCentredString(page_width / 2, date_y, f"Report generated on {current_date}")
+    c.showPage()
+
+    # --- CHART PAGES ---
+    cols = 2
+    rows = 3
+    cell_width = (page_width - 2 * margin) / cols
+    cell_height = (page_height - 2 * margin) / rows
+    total_charts = len(charts)
+
+    for i in range(0, total_charts, 6):
+        c.setLineWidth(2)
+        c.rect(margin, margin, page_width - 2*margin, page_height - 2*margin)
+        batch = charts[i:i+6]
+        for j, (chart_title, img_buffer) in enumerate(batch):
+            row = j // cols
+            col = j % cols
+            cell_x = margin + col * cell_width
+            cell_y = margin + (rows - row - 1) * cell_height
+
+            # Wrap the title text to keep it neat within each chart cell
+            lines = wrap_text(chart_title, max_chars=30)
+            c.setFont("Helvetica-Bold", 12)
+            line_y = cell_y + cell_height - 15
+            for line in lines:
+                c.drawCentredString(cell_x + cell_width/2, line_y, line)
+                line_y -= 14
+            title_height = 14 * len(lines) + 5
+
+            # Add chart image into the cell area
+            img_x = cell_x + 5
+            img_y = cell_y + 5
+            img_w = cell_width - 10
+            img_h = cell_height - title_height - 10
+            image = ImageReader(img_buffer)
+            c.drawImage(image, img_x, img_y, width=img_w, height=img_h)
+
+        # Last page thank you note
+        if i + len(batch) >= total_charts and not tables:
+            c.setFont("Helvetica-Bold", 12)
+            c.drawCentredString(page_width / 2, margin + 10, "Thank you for using WhatsApp Chat Analyzer!")
+
+        c.showPage()
+
+    # --- APPENDIX: DATA TABLES ---
+    if tables:
+        draw_tables(c, tables, margin)
+        c.setFont("Helvetica-Bold", 12)
+        c.drawCentredString(page_width / 2, margin + 10, "Thank you for using WhatsApp Chat Analyzer!")
+        c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+def draw_tables(c, tables, margin, row_height=14):
+    """
+    Draws (title, header, rows) tables one below the other, starting a new page whenever the next
+    row does not fit. Columns share the page width evenly.
+    """
+    page_width, page_height = letter
+    width = page_width - 2 * margin
+    y = page_height - margin
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(margin, y - 16, "Appendix: Data Tables")
+    y -= 40
+    for title, header, rows in tables:
+        # Keep a title with at least its header and first row
+        if y - 4 * row_height < margin + 20:
+            c.showPage()
+            y = page_height - margin
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(margin, y - 12, title)
+        y -= 12 + row_height
+        col_width = width / len(header)
+        for k, line in enumerate([header] + list(rows)):
+            if y - row_height < margin + 20:
+                c.showPage()
+                y = page_height - margin
+            c.setFont("Helvetica-Bold" if k == 0 else "Helvetica", 9)
+            for col, value in enumerate(line):
+                c.drawString(margin + col * col_width, y - 10, pdf_text(value, col_width))
+            y -= row_height
+        y -= row_height
+
+def pdf_text(value, width, font_size=9):
+    """
+    Formats a table cell for the PDF's built-in fonts: emojis are written as their names and long text
+    is cut to the column width.
+    """
+    text = emoji.demojize(str(value))
+    max_chars = max(4, int(width / (font_size * 0.5)))
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+def report_tables(selected_user, chat, cap_hours=None):
+    """
+    Returns the appendix tables as (title, header, rows): statistics, top words, emojis and response times.
+    """
+    num_messages, words, num_media_messages = helper.fetch_stats(selected_user, chat)
+    num_links = helper.count_links(selected_user, chat)
+    stats = [("Total Messages", num_messages), ("Total Words", words),
+             ("Media Shared", num_media_messages), ("Links Shared", num_links)]
+    most_common_df = helper.most_common_words(selected_user, chat)
+    emoji_df = helper.emoji_helper(selected_user, chat).head(20)
+    response_df = helper.response_time_analysis(selected_user, chat, cap_hours=cap_hours)
+    return [
+        ("Statistics", ("Statistic", "Value"), stats),
+        ("Most Common Words", ("Word", "Count"), most_common_df.itertuples(index=False)),
+        ("Top Emojis", ("Emoji", "Count"), emoji_df.itertuples(index=False)),
+        ("Response Time (hours)", tuple(response_df.columns), response_df.itertuples(index=False)),
+    ]
+
+@result_cache.memoize
+def build_report(selected_user, chat, start=None, end=None, max_points=None, window_minutes=None,
+                 cap_hours=None, appendix=False):
+    """
+    Builds the PDF report for a chat and user and returns its bytes.
+
+    Parameters:
+        start, end, max_points, window_minutes: Chart parameters, as for `report_charts`.
+        cap_hours (float, optional): Reply cap of the response times in the appendix.
+        appendix (bool): Whether to add the data tables after the charts.
+    """
+    num_messages, words, num_media_messages = helper.fetch_stats(selected_user, chat)
+    num_links = helper.count_links(selected_user, chat)
+    summary_text = f"Total Messages: {num_messages} | Total Words: {words} | Media Shared: {num_media_messages} | Links Shared: {num_links}"
+    report = report_charts(selected_user, chat, start=start, end=end, max_points=max_points,
+                           window_minutes=window_minutes)
+    tables = report_tables(selected_user, chat, cap_hours=cap_hours) if appendix else ()
+    pdf_buffer = generate_pdf_charts_report([(title, io.BytesIO(png)) for title, png in report],
+                                            summary_text=summary_text, tables=tables)
+    return pdf_buffer.getvalue()
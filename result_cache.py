@@ -0,0 +1,158 @@
+import functools
+import os
+import sys
+import threading
+from collections import OrderedDict
+from itertools import chain
+import numpy as np
+import pandas as pd
+import profiler
+
+# Upper bound on the estimated size of all cached helper results; least recently used results are evicted first
+max_result_bytes = int(os.environ.get('CHAT_RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Cached results: key -> (value, size), ordered from least to most recently used
+results = OrderedDict()
+counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+total_bytes = 0
+# Streamlit serves every session from its own thread, so the cache is shared and guarded by a lock
+lock = threading.Lock()
+
+
+def result_size(value):
+    """
+    Estimates the memory held by a cached helper result in bytes.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        size = value.memory_usage(deep=True)
+        return int(size.sum() if isinstance(size, pd.Series) else size)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(result_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_size(item) for item in value.values())
+    # Word clouds keep their rendered RGB canvas
+    layout = getattr(value, 'layout_', None)
+    if layout is not None:
+        return getattr(value, 'width', 0) * getattr(value, 'height', 0) * 3 + 100 * len(layout)
+    # Graphs: a rough per-node and per-edge overhead
+    if hasattr(value, 'number_of_edges'):
+        return 500 * (value.number_of_nodes() + value.number_of_edges())
+    return sys.getsizeof(value)
+
+
+def detach(value):
+    """
+    Returns a copy of pandas results, so callers that modify a table cannot corrupt the cached one.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(detach(item) for item in value)
+    return value
+
+
+def lookup(key):
+    """
+    Returns (True, value) for a cached result and marks it as most recently used, or (False, None).
+    """
+    with lock:
+        if key in results:
+            results.move_to_end(key)
+            counters['hits'] += 1
+            return True, results[key][0]
+        counters['misses'] += 1
+        return False, None
+
+
+def store(key, value, max_bytes=None):
+    """
+    Caches a result and evicts the least recently used ones until the cache fits in `max_bytes`.
+    Results larger than the whole budget are not cached.
+    """
+    global total_bytes
+    max_bytes = max_result_bytes if max_bytes is None else max_bytes
+    size = result_size(value)
+    if size > max_bytes:
+        return
+    with lock:
+        if key in results:
+            total_bytes -= results.pop(key)[1]
+        results[key] = (value, size)
+        total_bytes += size
+        while total_bytes > max_bytes:
+            _, (_, evicted_size) = results.popitem(last=False)
+            total_bytes -= evicted_size
+            counters['evictions'] += 1
+
+
+def is_chat(value):
+    """
+    Tells whether an argument is a chat index (anything whose class defines a `fingerprint`).
+    """
+    return getattr(type(value), 'fingerprint', None) is not None
+
+
+def call_key(func, args, kwargs):
+    """
+    Returns the cache key of a helper call: the helper's name, the chat's fingerprint and the remaining
+    arguments. Calls without a chat index are not cached and get None.
+    """
+    chats = [arg for arg in chain(args, kwargs.values()) if is_chat(arg)]
+    if not chats:
+        return None
+    return (func.__qualname__, chats[0].fingerprint,
+            tuple(arg for arg in args if not is_chat(arg)),
+            tuple(sorted((name, arg) for name, arg in kwargs.items() if not is_chat(arg))))
+
+
+def memoize(func):
+    """
+    Decorator caching a helper's result per chat, selected user and parameters (see `call_key`).
+
+    Only calls made with a ChatIndex are cached; a plain DataFrame is indexed on the fly for every call
+    anyway, so those calls are passed straight through. The wrapper's `is_cached(*args, **kwargs)` tells
+    whether a call would be answered from the cache. Computed results are recorded by `profiler` when
+    profiling is on; cache hits are not.
+    """
+    compute = profiler.profiled()(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = call_key(func, args, kwargs)
+        if key is None:
+            return compute(*args, **kwargs)
+        found, value = lookup(key)
+        if not found:
+            value = compute(*args, **kwargs)
+            store(key, value)
+        return detach(value)
+
+    def is_cached(*args, **kwargs):
+        key = call_key(func, args, kwargs)
+        with lock:
+            return key is not None and key in results
+
+    wrapper.is_cached = is_cached
+    return wrapper
+
+
+def stats():
+    """
+    Returns the cache counters: hits, misses, evictions, number of cached results and their estimated bytes.
+    """
+    with lock:
+        return dict(counters, entries=len(results), bytes=total_bytes)
+
+
+def clear():
+    """
+    Drops every cached result and resets the counters.
+    """
+    global total_bytes
+    with lock:
+        results.clear()
+        total_bytes = 0
+        for name in counters:
+            counters[name] = 0
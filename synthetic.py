@@ -0,0 +1,180 @@
+"""
+Deterministic synthetic WhatsApp chat exports, for benchmarking the parser and the analyses.
+
+The same parameters and seed always produce the same export. Messages are generated in chunks with
+numpy, each chunk seeded from (seed, chunk number), so large exports can be streamed to a file
+without holding them in memory.
+
+Example:
+    python synthetic.py chat.txt --messages 1000000 --participants 12 --dialect android-24h
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+# Version of the generated text; bump it whenever the output for the same parameters changes
+generator_version = '1'
+
+# Date-time stamp that starts every message, as strftime formats, for the export dialects the parser reads
+dialects = {
+    'android-12h': '%m/%d/%y, %I:%M %p - ',
+    'android-24h': '%d/%m/%Y, %H:%M - ',
+    'android-dots': '%d.%m.%y %H:%M - ',
+    'ios-24h': '[%d/%m/%y, %H:%M:%S] ',
+    'ios-12h': '[%m/%d/%y, %I:%M:%S %p] ',
+    'android-es-12h': '%d/%m/%y, %I:%M %p - ',
+    'android-iso': '%Y-%m-%d, %H:%M - ',
+}
+# Dialects writing the meridiem another way than strftime's AM/PM, as (AM, PM)
+meridiems = {
+    'android-es-12h': ('a. m.', 'p. m.'),
+}
+
+first_names = ['Alice', 'Bob', 'Carol Ann', 'Dave', 'Eve', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy',
+               'Mallory', 'Niaj', 'Olivia', 'Peggy', 'Rupert', 'Sybil', 'Trent', 'Victor', 'Walter', 'Zoë']
+words = ('hi hello ok okay yes no maybe sure thanks thank you lol haha good great nice cool bad sad happy '
+         'love see tomorrow today tonight later now soon morning evening night weekend plan meet call '
+         'home work office school class exam food dinner lunch coffee tea movie music game match party '
+         'trip car bus train late early time again please sorry done wait going coming where when what '
+         'why how who the a an and or but so to of in on at for with is are was were be have has had do '
+         'did will would can could should i we they he she it this that there here my your our their '
+         'me us them very really just too also still already never always').split()
+emojis = ['😂', '❤️', '👍', '🙏', '😊', '😍', '🔥', '😭', '🎉', '👋🏽', '🤔', '😅', '🙂', '💯', '👨‍👩‍👧']
+domains = ['example.com', 'www.youtube.com', 'youtu.be', 'github.com', 'en.wikipedia.org',
+           'maps.google.com', 'www.instagram.com', 'news.ycombinator.com']
+# What exports write in place of attachments when exported without media
+media_placeholder = '<Media omitted>'
+
+
+def participant_names(participants):
+    """
+    Returns `participants` distinct names, a few of them with a trailing emoji as real contacts often have.
+    """
+    names = []
+    for i in range(participants):
+        name = first_names[i % len(first_names)]
+        if i >= len(first_names):
+            name += f" {i // len(first_names) + 1}"
+        if i % 7 == 3:
+            name += " 🙂"
+        names.append(name)
+    return names
+
+def generate_chunks(num_messages, participants=5, multiline_ratio=0.05, emoji_ratio=0.15, link_ratio=0.02,
+                    media_ratio=0.03, notification_ratio=0.005, dialect='android-12h', start='2020-01-01',
+                    days=730, burst_size=20, reply_seconds=90, seed=0, chunk_size=100000):
+    """
+    Yields a synthetic export as text chunks of up to `chunk_size` messages each.
+
+    Parameters:
+        num_messages (int): Number of messages (including group notifications).
+        participants (int): Number of users; their activity follows a Zipf-like distribution, so a few
+            users write most messages and some are nearly silent.
+        multiline_ratio (float): Share of text messages spanning several lines.
+        emoji_ratio (float): Share of text messages containing emojis.
+        link_ratio (float): Share of text messages containing a link.
+        media_ratio (float): Share of messages that are omitted media.
+        notification_ratio (float): Share of group notifications (no author).
+        dialect (str): Date-time stamp format, one of `dialects`.
+        start (str): Date of the first message.
+        days (float): Span of the chat (longer if the bursts alone take more time than that).
+        burst_size (float): Average number of messages in a burst of conversation; bursts are separated
+            by long random pauses spreading them over `days`.
+        reply_seconds (float): Average gap between messages within a burst.
+        seed (int): Random seed.
+    """
+    header_format = dialects[dialect]
+    names = np.array(participant_names(participants), dtype=object)
+    weights = 1 / np.arange(1, participants + 1)
+    weights /= weights.sum()
+    start = pd.Timestamp(start).value // 10**9
+    num_bursts = max(num_messages / burst_size, 1)
+    pause = max(days * 86400 - num_messages * reply_seconds, 0) / num_bursts
+    clock = 0.0
+
+    for chunk, first in enumerate(range(0, num_messages, chunk_size)):
+        rng = np.random.default_rng([seed, chunk])
+        n = min(chunk_size, num_messages - first)
+
+        # Message times: quick replies within bursts of conversation, long pauses between them
+        gaps = rng.exponential(reply_seconds, n)
+        new_burst = rng.random(n) < 1 / burst_size
+        gaps[new_burst] += rng.exponential(pause, new_burst.sum())
+        times = start + (clock + np.cumsum(gaps)).astype(np.int64)
+        clock += gaps.sum()
+        headers = pd.to_datetime(times, unit='s').strftime(header_format)
+        if dialect in meridiems:
+            am, pm = meridiems[dialect]
+            headers = headers.str.replace('AM', am).str.replace('PM', pm)
+
+        authors = names[rng.choice(participants, n, p=weights)]
+        kind = rng.random(n)
+        lengths = rng.integers(1, 13, n)
+        word_ids = rng.integers(0, len(words), lengths.sum())
+        ends = np.cumsum(lengths)
+        has_emoji = rng.random(n) < emoji_ratio
+        has_link = rng.random(n) < link_ratio
+        is_multiline = rng.random(n) < multiline_ratio
+        picks = rng.integers(0, 1 << 30, (n, 4))
+
+        lines = []
+        for i in range(n):
+            if kind[i] < notification_ratio:
+                other = names[picks[i, 0] % participants]
+                lines.append(f"{headers[i]}{authors[i]} added {other}" if picks[i, 1] % 2
+                             else f"{headers[i]}{authors[i]} left")
+                continue
+            if kind[i] < notification_ratio + media_ratio:
+                lines.append(f"{headers[i]}{authors[i]}: {media_placeholder}")
+                continue
+            text = [words[w] for w in word_ids[ends[i] - lengths[i]:ends[i]]]
+            if has_emoji[i]:
+                count = picks[i, 0] % 3 + 1
+                text.append(''.join(emojis[(picks[i, 1] + k) % len(emojis)] for k in range(count)))
+            if has_link[i]:
+                text.insert(picks[i, 2] % len(text),
+                            f"https://{domains[picks[i, 2] % len(domains)]}/p/{picks[i, 3] % 100000}")
+            if is_multiline[i] and len(text) > 1:
+                cut = picks[i, 3] % (len(text) - 1) + 1
+                lines.append(f"{headers[i]}{authors[i]}: {' '.join(text[:cut])}\n{' '.join(text[cut:])}")
+            else:
+                lines.append(f"{headers[i]}{authors[i]}: {' '.join(text)}")
+        yield '\n'.join(lines) + '\n'
+
+def generate_export(num_messages, **options):
+    """
+    Returns a synthetic export as one string. See `generate_chunks` for the options.
+    """
+    return ''.join(generate_chunks(num_messages, **options))
+
+def write_export(path, num_messages, **options):
+    """
+    Writes a synthetic export to `path` chunk by chunk. See `generate_chunks` for the options.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for text in generate_chunks(num_messages, **options):
+            f.write(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic WhatsApp chat export.")
+    parser.add_argument('output', help="Path of the .txt export to write")
+    parser.add_argument('--messages', type=int, default=10000, help="Number of messages")
+    parser.add_argument('--participants', type=int, default=5, help="Number of users")
+    parser.add_argument('--multiline-ratio', type=float, default=0.05, help="Share of multiline messages")
+    parser.add_argument('--emoji-ratio', type=float, default=0.15, help="Share of messages with emojis")
+    parser.add_argument('--link-ratio', type=float, default=0.02, help="Share of messages with a link")
+    parser.add_argument('--media-ratio', type=float, default=0.03, help="Share of omitted media messages")
+    parser.add_argument('--dialect', choices=sorted(dialects), default='android-12h', help="Date-time format")
+    parser.add_argument('--days', type=float, default=730, help="Span of the chat in days")
+    parser.add_argument('--burst-size', type=float, default=20, help="Average messages per burst of conversation")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    args = parser.parse_args(argv)
+    write_export(args.output, args.messages, participants=args.participants,
+                 multiline_ratio=args.multiline_ratio, emoji_ratio=args.emoji_ratio,
+                 link_ratio=args.link_ratio, media_ratio=args.media_ratio, dialect=args.dialect,
+                 days=args.days, burst_size=args.burst_size, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
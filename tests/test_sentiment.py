@@ -0,0 +1,33 @@
+"""
+Checks that the chat's cached sentiment scores equal TextBlob's score of every message as written.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from textblob import TextBlob
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import helper
+
+
+def make_chat(messages):
+    dates = pd.date_range('2021-01-01 09:00', periods=len(messages), freq='min')
+    return pd.DataFrame({
+        'date': dates,
+        'user': pd.Categorical(['Alice', 'Bob'] * (len(messages) // 2) + ['Alice'] * (len(messages) % 2)),
+        'message': messages,
+        'only_date': dates.normalize(),
+    })
+
+
+def test_cached_sentiment_matches_textblob():
+    messages = [':D\n', ':-D\n', '=D\n', ':d\n', 'haha :D\n', 'haha :d\n', 'HAHA :D\n', 'I LOVE this\n',
+                'i love this\n', 'I love this\n', '  great  \n', 'great\n', 'this is bad :(\n', ':)\n',
+                'ok\n', 'ok\n', 'Ok\n', 'line one\nline two is awful\n']
+    scores = helper.ChatIndex(make_chat(messages)).sentiment
+    for message, (polarity, subjectivity) in zip(messages, scores.itertuples(index=False)):
+        expected = TextBlob(message).sentiment
+        assert np.isclose(polarity, expected.polarity, atol=1e-6), message
+        assert np.isclose(subjectivity, expected.subjectivity, atol=1e-6), message